@@ -0,0 +1,3249 @@
+import array
+import base64
+import bisect
+import collections
+import enum
+import importlib
+import itertools
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import weakref
+from abc import abstractmethod, ABC
+from typing import (
+    ClassVar,
+    Generic,
+    NamedTuple,
+    TextIO,
+    TypeVar,
+    overload,
+    Any,
+)
+from collections.abc import Callable, Iterator, Sequence
+
+MESSAGE_MAGIC = 0xB5C0C4B3
+TEXT_MAGIC = 0xD812C8F5
+BYTES_MAGIC = 0xDCDBBE10
+LIST_MAGIC = 0x3400BB46
+DIRECT_LIST_MAGIC = 0xE2C6CC05
+MESSAGE_FILE_MAGIC = 0x8F3A61D2
+MESSAGE_INDEX_MAGIC = 0x4C7E09B5
+COMPRESSED_MAGIC = 0x6E1DA7C3
+
+# Objects a message can be read from
+Buffer = bytes | bytearray | memoryview | mmap.mmap
+
+# Precompiled little endian codecs for the fixed width types
+_INT8 = struct.Struct("<b")
+_UINT8 = struct.Struct("<B")
+_INT16 = struct.Struct("<h")
+_UINT16 = struct.Struct("<H")
+_INT32 = struct.Struct("<i")
+_UINT32 = struct.Struct("<I")
+_INT64 = struct.Struct("<q")
+_UINT64 = struct.Struct("<Q")
+_FLOAT32 = struct.Struct("<f")
+_FLOAT64 = struct.Struct("<d")
+_UINT48 = struct.Struct("<IH")
+_HEADER = struct.Struct("<IIH")
+_DIRECT_HEADER = struct.Struct("<II")
+_UNION = struct.Struct("<HIH")
+# Magic and version at the start of a message file, and the offset of its
+# index, the number of messages and the index magic at its end
+_FILE_HEADER = struct.Struct("<II")
+_FILE_TRAILER = struct.Struct("<QQI")
+# Magic, version, codec, block size, uncompressed size and number of blocks at
+# the start of a compressed message
+_COMPRESSED_HEADER = struct.Struct("<IHHIQQ")
+
+# The codecs above keyed by their struct format character
+_CODECS: dict[str, struct.Struct] = {
+    "b": _INT8,
+    "B": _UINT8,
+    "h": _INT16,
+    "H": _UINT16,
+    "i": _INT32,
+    "I": _UINT32,
+    "q": _INT64,
+    "Q": _UINT64,
+    "f": _FLOAT32,
+    "d": _FLOAT64,
+}
+
+
+class Hash(ABC):
+    def update(self, data: bytes) -> None:
+        pass
+
+
+def digest(h: Hash, v: Any) -> None:
+    if v is None:
+        return
+    if hasattr(v, "_digest"):
+        v._digest(h)
+    else:
+        h.update(b"\xff\xe0")
+        if isinstance(v, enum.IntEnum):
+            h.update(str(int(v)).encode("utf-8"))
+        elif isinstance(v, (bool, int)):
+            h.update(str(v).encode("utf-8"))
+        elif isinstance(v, float):
+            h.update(_FLOAT64.pack(v).replace(b"\xff", b"\xff\xef"))
+        elif isinstance(v, str):
+            h.update(v.encode("utf-8"))
+        elif isinstance(v, (bytes, memoryview)):
+            h.update(bytes(v).replace(b"\xff", b"\xff\xef"))
+        else:
+            assert False
+
+
+B = TypeVar("B")
+
+
+class StructType(Generic[B]):
+    _WIDTH: ClassVar[int] = 0
+    _STRUCT: ClassVar[struct.Struct] = struct.Struct("<")
+    # Name, numpy dtype and offset of each member. The dtype of struct members
+    # is given as their StructType
+    _NUMPY: ClassVar[tuple[tuple[str, Any, int], ...]] = ()
+
+    @staticmethod
+    @abstractmethod
+    def _write(writer: "Writer", offset: int, value: B) -> B: ...
+
+    @staticmethod
+    @abstractmethod
+    def _unpack(v: tuple[Any, ...]) -> B:
+        """Construct the struct from the values unpacked by _STRUCT"""
+
+    @staticmethod
+    @abstractmethod
+    def _from_dict(d: dict[str, Any]) -> B:
+        """Construct the struct from a dict of the form returned by _to_dict"""
+
+    def __str__(self):
+        o = []
+        for m in self.__slots__:
+            o.append("%s: %s" % (m, getattr(self, m)))
+        return "{%s}" % ", ".join(o)
+
+    def _to_dict(self):
+        o = {}
+        for m in self.__slots__:
+            v = getattr(self, m)
+            if hasattr(v, "_to_dict"):
+                v = v._to_dict()
+            o[m] = v
+        return o
+
+    def _digest(self, h: Hash) -> None:
+        h.update(b"\xff\xe1")
+        for m in self.__slots__:
+            digest(h, getattr(self, m))
+        h.update(b"\xff\xe2")
+
+
+def numpy_table_dtype(t: "type[TableIn] | type[TableOut]") -> Any:
+    """Return the numpy structured dtype matching the layout of the tables of
+    type t in a direct table list, with a field for each basic, enum and struct
+    member. Bools are stored as bits and have no field"""
+    import numpy
+
+    if issubclass(t, TableOut):
+        t = t._IN
+    names, formats, offsets = [], [], []
+    for n, c in t._COLUMNS.items():
+        if c.kind == "bool":
+            continue
+        names.append(n)
+        if c.kind == "basic":
+            formats.append(numpy_dtype("<" + c.type))
+        elif c.kind == "enum":
+            formats.append(numpy_dtype("B"))
+        else:
+            formats.append(numpy_dtype(c.type))
+        offsets.append(c.offset)
+    return numpy.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": len(t._DEFAULT),
+        }
+    )
+
+
+def numpy_dtype(t: "str | type[StructType]") -> Any:
+    """Return the numpy dtype of a basic type given by its dtype string, or the
+    structured dtype matching the packed layout of a struct type"""
+    import numpy
+
+    if isinstance(t, str):
+        return numpy.dtype(t)
+    return numpy.dtype(
+        {
+            "names": [n for (n, _, _) in t._NUMPY],
+            "formats": [numpy_dtype(f) for (_, f, _) in t._NUMPY],
+            "offsets": [o for (_, _, o) in t._NUMPY],
+            "itemsize": t._WIDTH,
+        }
+    )
+
+
+class Pointer(NamedTuple):
+    """Layout of a table member stored outside the fixed size part of the table.
+
+    offset is the position of its slot in the table, holding the offset of the
+    object, or its size if inplace. kind is one of "text", "bytes", "table",
+    "union", and for list elements also "basic", "bool", "enum", "struct" and
+    "direct". type is the In class of tables and unions, the struct format
+    character of basic types and the class of enums and structs"""
+
+    offset: int
+    kind: str
+    type: Any
+    list_: bool
+    inplace: bool
+
+
+class Column(NamedTuple):
+    """Layout of a table member stored in the fixed size part of the table.
+
+    offset is the position of the member in the table. kind is one of "basic",
+    "bool", "enum" and "struct". type is the struct format character of basic
+    types and the class of enums and structs. Bools are stored in bit of the
+    byte at offset. Optional members other than floats and enums store their
+    presence in has_bit of the byte at has_offset. Floats are absent when NaN
+    and enums when out of range"""
+
+    offset: int
+    kind: str
+    type: Any
+    bit: int
+    optional: bool
+    has_offset: int = -1
+    has_bit: int = 0
+
+
+def _is_numpy(values: Any) -> bool:
+    return hasattr(values, "dtype") and hasattr(values, "tobytes")
+
+
+def _numpy_ints(numpy: Any, values: Any, t: Any, error: type[Exception]) -> Any:
+    """Return values as a numpy array of the integer dtype t. Values that do
+    not fit raise error, like the pure python paths, instead of letting numpy
+    wrap them around"""
+    v = numpy.asarray(values)
+    if v.dtype != t:
+        if v.dtype.kind not in "biu":
+            raise TypeError("Expected integers but got %s" % v.dtype)
+        info = numpy.iinfo(t)
+        if v.size and (v.min() < info.min or v.max() > info.max):
+            raise error("Values out of range for %s" % t)
+    return v.astype(t, copy=False)
+
+
+def _encode_basic(e: str, w: int, values: Any) -> bytes:
+    """Return the little endian payload of a list of basic values of type e"""
+    if _is_numpy(values):
+        import numpy
+
+        t = numpy.dtype("<" + e)
+        if t.kind in "iu":
+            return _numpy_ints(numpy, values, t, OverflowError).tobytes()
+        return numpy.asarray(values).astype(t, copy=False).tobytes()
+    a = array.array(e, values)
+    if a.itemsize != w:
+        return struct.pack("<%d%s" % (len(a), e), *a)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+_BITS = bytes.maketrans(b"\0\1", b"01")
+
+
+def _encode_bool(values: Any) -> tuple[bytes, int]:
+    """Return the packed payload of a list of bools and its length"""
+    if _is_numpy(values):
+        import numpy
+
+        a = numpy.asarray(values, numpy.bool_).ravel()
+        return numpy.packbits(a, bitorder="little").tobytes(), len(a)
+    bits = bytes(map(bool, values))
+    # Parse the bits as a base 2 number with the first bit least significant
+    v = int(bits[::-1].translate(_BITS) or b"0", 2)
+    return v.to_bytes((len(bits) + 7) >> 3, "little"), len(bits)
+
+
+def _encode_enum(values: Any) -> bytes:
+    """Return the payload of a list of enum values, None is stored as 255"""
+    if _is_numpy(values):
+        import numpy
+
+        return _numpy_ints(
+            numpy, values, numpy.dtype(numpy.uint8), ValueError
+        ).tobytes()
+    return bytes(255 if v is None else v for v in values)
+
+
+TI = TypeVar("TI", bound="TableIn")
+TO = TypeVar("TO", bound="TableOut")
+UI = TypeVar("UI", bound="UnionIn")
+UO = TypeVar("UO", bound="UnionOut")
+E = TypeVar("E", bound=enum.IntEnum)
+S = TypeVar("S", bound=StructType)
+
+TT = TypeVar("TT")
+
+
+def split48_(v: int) -> tuple[int, int]:
+    return (v & 0xFFFFFFFF, v >> 32)
+
+
+def pack48_(v: int) -> bytes:
+    lo, h = split48_(v)
+    return _UINT48.pack(lo, h)
+
+
+def pack48_into_(data: bytearray, offset: int, v: int) -> None:
+    _UINT48.pack_into(data, offset, v & 0xFFFFFFFF, v >> 32)
+
+
+def join48_(lo: int, h: int) -> int:
+    return lo + (h << 32)
+
+
+def unpack48_(v: bytes) -> int:
+    lo, h = _UINT48.unpack(v)
+    return join48_(lo, h)
+
+
+def _view(data: Buffer) -> memoryview:
+    """Return a byte memoryview of data, so it can be sliced without copying"""
+    return memoryview(data).cast("B")
+
+
+def unpack48_from_(data: Buffer, offset: int) -> int:
+    lo, h = _UINT48.unpack_from(data, offset)
+    return join48_(lo, h)
+
+
+# Number of elements unpacked at a time when iterating over a list of numbers
+_CHUNK = 1 << 14
+
+# The eight bools packed in each possible byte
+_BOOL_BYTES = [tuple(b >> i & 1 != 0 for i in range(8)) for b in range(256)]
+
+
+def _iter_numbers(f: str, w: int, data: Buffer, offset: int, size: int) -> Iterator:
+    return itertools.chain.from_iterable(
+        struct.unpack_from("<%d%s" % (min(_CHUNK, size - i), f), data, offset + i * w)
+        for i in range(0, size, _CHUNK)
+    )
+
+
+def _iter_offsets(data: Buffer, offset: int, size: int) -> Iterator[int]:
+    return (
+        lo | hi << 32
+        for lo, hi in _UINT48.iter_unpack(_view(data)[offset : offset + size * 6])
+    )
+
+
+class Adder(Generic[B]):
+    def __init__(self, fset: Callable[[TT, B], None]) -> None:
+        self.fset = fset
+        self.__doc__ = fset.__doc__
+
+    def __set__(self, obj: TT, value: B) -> None:
+        self.fset(obj, value)
+
+
+class ListIn(Sequence[B]):
+    """Class for reading a list of B"""
+
+    def __init__(
+        self,
+        reader: "Reader",
+        size: int,
+        offset: int,
+        getter: Callable[["Reader", int, int], B],
+        haser: Callable[["Reader", int, int], bool],
+        require_has: bool,
+        dtype: Any = None,
+        iterator: Callable[["Reader", int, int], Iterator[B]] | None = None,
+        width: int = 0,
+        table: "type[TableIn] | None" = None,
+        source: tuple[str, tuple] | None = None,
+    ) -> None:
+        """Private constructor. Use the accessor methods on tables to get an instance"""
+        self._reader = reader
+        self._offset = offset
+        self._size = size
+        self._getter = getter
+        self._haser = haser
+        self._require_has = require_has
+        self._dtype = dtype
+        self._iterator = iterator
+        self._width = width
+        # The type of the tables in a direct table list
+        self._table = table
+        # The method of the reader and its arguments that constructed the list,
+        # used to construct it again when unpickled
+        self._source = source
+        # For views that can not start at an element boundary, or skip elements,
+        # the indices of the elements relative to _offset
+        self._range: range | None = None
+
+    def has(self, idx: int) -> bool:
+        """Return True if there is an element on possision idx. Note that idx must be less than size"""
+        if self._range is not None:
+            idx = self._range[idx]
+        return self._haser(self._reader, self._offset, idx)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @overload
+    def __getitem__(self, idx: int) -> B: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> "ListIn[B]": ...
+
+    def __getitem__(self, idx: int | slice) -> "B | ListIn[B]":
+        if isinstance(idx, slice):
+            r = range(self._size) if self._range is None else self._range
+            return self._slice(r[idx])
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError()
+        if self._range is not None:
+            idx = self._range[idx]
+        if self._require_has and not self._haser(self._reader, self._offset, idx):
+            raise IndexError()
+        return self._getter(self._reader, self._offset, idx)
+
+    def _slice(self, r: range) -> "ListIn[B]":
+        """Return a view of the elements r, given relative to _offset"""
+        lo = min(r[0], r[-1]) if r else 0
+        if self._dtype is bool:
+            lo &= ~7
+            offset = self._offset + (lo >> 3)
+        else:
+            offset = self._offset + lo * self._width
+        res = ListIn[B](
+            self._reader,
+            len(r),
+            offset,
+            self._getter,
+            self._haser,
+            self._require_has,
+            self._dtype,
+            self._iterator,
+            self._width,
+            self._table,
+            self._source,
+        )
+        r = range(r.start - lo, r.stop - lo, r.step)
+        if r.start != 0 or r.step != 1:
+            res._range = r
+        return res
+
+    def __reduce__(self) -> tuple:
+        if self._source is None:
+            raise TypeError("Only lists read from a message can be pickled")
+        return (
+            _unpickle_list,
+            (self._reader, self._source, self._offset, self._size, self._range),
+        )
+
+    def chunks(self, n: int) -> Iterator["ListIn[B]"]:
+        """Return views of the consecutive windows of n elements of the list.
+        The last window may be shorter"""
+        for i in range(0, self._size, n):
+            yield self[i : i + n]
+
+    def __iter__(self) -> Iterator[B]:
+        r = self._range
+        if self._iterator is None or (
+            r is not None and (r.step < 0 or self._require_has)
+        ):
+            return super().__iter__()
+        if r is None:
+            return self._iterator(self._reader, self._offset, self._size)
+        if not r:
+            return iter(())
+        return itertools.islice(
+            self._iterator(self._reader, self._offset, r[-1] + 1),
+            r.start,
+            None,
+            r.step,
+        )
+
+    def __str__(self) -> str:
+        return "[%s]" % (", ".join(map(str, self)))
+
+    def tolist(self) -> list[B]:
+        """Return all the elements of the list as a python list"""
+        return list(self)
+
+    def as_numpy(self) -> Any:
+        """Return the list as a numpy array.
+
+        Lists of numbers, enums and structs are returned as a view of the
+        message without copying. Enums are returned as their uint8 values, where
+        255 means no value, and structs using a structured dtype matching their
+        layout. Bool lists are unpacked into a new array. Requires numpy."""
+        import numpy
+
+        if self._dtype is None:
+            raise TypeError("Only lists of basic types, enums and structs are arrays")
+        r = self._range
+        size = self._size
+        if r is not None:
+            size = max(r[0], r[-1]) + 1 if r else 0
+        if self._dtype is bool:
+            n = (size + 7) >> 3
+            packed = numpy.frombuffer(
+                self._reader._export(self._offset, n), numpy.uint8, n, self._offset
+            )
+            a = numpy.unpackbits(packed, count=size, bitorder="little").view(
+                numpy.bool_
+            )
+        else:
+            dtype = numpy_dtype(self._dtype)
+            data = self._reader._export(self._offset, size * dtype.itemsize)
+            a = numpy.frombuffer(data, dtype, size, self._offset)
+        if r is not None:
+            a = a[r.start : r.stop if r.stop >= 0 else None : r.step]
+        return a
+
+    def column(self, name: str) -> Any:
+        """Return member name of every table in a direct table list.
+
+        name may also be has_ followed by the name of an optional member or an
+        enum, to get whether the member is present in each table. The value of
+        absent members is unspecified. If numpy is installed, basic types, enums
+        and structs are returned as a strided view of the message without
+        copying, like as_numpy. Otherwise an array.array is returned, and a list
+        for structs. Bools are returned as a new array, of 0 and 1 without
+        numpy"""
+        t = self._table
+        if t is None:
+            raise TypeError("Only direct table lists have columns")
+        has = False
+        c = t._COLUMNS.get(name)
+        if c is None and name.startswith("has_"):
+            c = t._COLUMNS.get(name[4:])
+            has = c is not None and (c.optional or c.kind == "enum")
+            if not has:
+                c = None
+        if c is None:
+            raise KeyError("%s has no column %s" % (t.__name__, name))
+
+        r = self._range
+        size = self._size
+        if r is not None:
+            size = max(r[0], r[-1]) + 1 if r else 0
+        try:
+            import numpy
+        except ImportError:
+            col = self._column_array(t, c, has, size)
+        else:
+            col = self._column_numpy(numpy, t, c, has, size)
+        if r is not None:
+            col = col[r.start : r.stop if r.stop >= 0 else None : r.step]
+        return col
+
+    def _column_numpy(
+        self, numpy: Any, t: "type[TableIn]", c: Column, has: bool, size: int
+    ) -> Any:
+        def field(o: int, dtype: Any) -> Any:
+            dtype = numpy_dtype(dtype)
+            if o + dtype.itemsize > self._width:
+                # The tables were written with an older schema without the member
+                d = numpy.frombuffer(t._DEFAULT, dtype, 1, o)
+                return numpy.broadcast_to(d, (size,))
+            return numpy.ndarray(
+                (size,),
+                dtype,
+                self._reader._export(self._offset, size * self._width),
+                self._offset + o,
+                (self._width,),
+            )
+
+        if has and c.has_offset >= 0:
+            return (field(c.has_offset, "B") >> c.has_bit) & 1 != 0
+        if c.kind == "bool":
+            return (field(c.offset, "B") >> c.bit) & 1 != 0
+        if c.kind == "enum":
+            v = field(c.offset, "B")
+            return v < len(c.type) if has else v
+        if c.kind == "struct":
+            return field(c.offset, c.type)
+        v = field(c.offset, "<" + c.type)
+        return ~numpy.isnan(v) if has else v
+
+    def _column_array(self, t: "type[TableIn]", c: Column, has: bool, size: int) -> Any:
+        def field(o: int, w: int) -> bytes:
+            if o + w > self._width:
+                # The tables were written with an older schema without the member
+                return t._DEFAULT[o : o + w] * size
+            if size == 0:
+                return b""
+            data = _view(self._reader._export(self._offset, size * self._width))
+            out = bytearray(size * w)
+            for i in range(w):
+                s = self._offset + o + i
+                out[i::w] = data[s : s + (size - 1) * self._width + 1 : self._width]
+            return bytes(out)
+
+        if has and c.has_offset >= 0:
+            o, bit = c.has_offset, c.has_bit
+        elif c.kind == "bool":
+            o, bit = c.offset, c.bit
+        elif c.kind == "enum":
+            v = field(c.offset, 1)
+            if has:
+                v = v.translate(bytes(int(b < len(c.type)) for b in range(256)))
+            return array.array("B", v)
+        elif c.kind == "struct":
+            v = field(c.offset, c.type._WIDTH)
+            if c.type._WIDTH == 0:
+                return [c.type() for _ in range(size)]
+            return list(map(c.type._unpack, c.type._STRUCT.iter_unpack(v)))
+        else:
+            w = _CODECS[c.type].size
+            values = struct.unpack("<%d%s" % (size, c.type), field(c.offset, w))
+            if has:
+                return array.array("B", (v == v for v in values))
+            return array.array(c.type, values)
+        v = field(o, 1).translate(bytes(b >> bit & 1 for b in range(256)))
+        return array.array("B", v)
+
+    def _to_dict(self):
+        # All elements have the same type, so only the first is inspected
+        o = self.tolist()
+        if o and hasattr(o[0], "_to_dict"):
+            return [v._to_dict() for v in o]
+        return o
+
+    def _digest(self, h: Hash) -> None:
+        h.update(b"\xff\xe3")
+        d = self._dtype
+        if isinstance(d, str) and d != "B" and self._size and self._range is None:
+            # Encode a list of numbers in one go, as digest would do for each
+            data = self._reader._export(self._offset, self._size * self._width)
+            values = struct.unpack_from(
+                "%s%d%s" % (d[0], self._size, d[1]), data, self._offset
+            )
+            if d[1] in "fd":
+                h.update(
+                    b"".join(
+                        b"\xff\xe0" + _FLOAT64.pack(v).replace(b"\xff", b"\xff\xef")
+                        for v in values
+                    )
+                )
+            else:
+                h.update(b"".join(b"\xff\xe0%d" % v for v in values))
+        else:
+            for v in self:
+                digest(h, v)
+        h.update(b"\xff\xe4")
+
+
+def _unpickle_list(
+    reader: "Reader", source: tuple[str, tuple], offset: int, size: int, r: range | None
+) -> ListIn:
+    name, args = source
+    res = getattr(reader, name)(*args)
+    res._offset, res._size, res._range = offset, size, r
+    return res
+
+
+class UnionIn:
+    __slots__ = ["_reader", "_type", "_offset", "_size"]
+    # The layout of each member, None for removed members
+    _POINTERS: Sequence[Pointer | None] = ()
+
+    def __init__(
+        self, reader: "Reader", type: int, offset: int, size: int | None = None
+    ):
+        """Private constructor. Use the accessor methods on tables or the root method on Reader to get an instance"""
+        self._reader = reader
+        self._type = type
+        self._offset = offset
+        self._size = size
+
+    def __str__(self) -> str:
+        if self._type == 0:
+            return "{}"
+        m = self._MEMBERS[self._type - 1]
+        if hasattr(self, m):
+            return "{%s: %s}" % (m, getattr(self, m))
+        return "{%s}" % m
+
+    def _to_dict(self):
+        if self._type == 0:
+            return {}
+        m = self._MEMBERS[self._type - 1]
+        if not hasattr(self, m):
+            return {m: None}
+        v = getattr(self, m)
+        if hasattr(v, "_to_dict"):
+            v = v._to_dict()
+        return {m: v}
+
+    def __reduce__(self) -> tuple:
+        return (type(self), (self._reader, self._type, self._offset, self._size))
+
+    def _digest(self, h: Hash) -> None:
+        h.update(b"\xff\xe5%d" % (self._type))
+        if self._type == 0:
+            return
+        m = self._MEMBERS[self._type - 1]
+        digest(h, getattr(self, m, None))
+
+    def _get_ptr(self, magic: int) -> tuple[int, int]:
+        if self._size is not None:
+            self._reader._fill(self._offset, self._size)
+            return (self._offset, self._size)
+        return (self._offset + 10, self._reader._read_size(self._offset, magic))
+
+
+class TableIn:
+    """Base class for reading a table"""
+
+    __slots__ = ["_reader", "_offset", "_size", "_pin"]
+    _MAGIC: int = 0
+    _DEFAULT: ClassVar[bytes] = b""
+    _MEMBERS: Sequence[str] = None
+    _POINTERS: Sequence[Pointer] = ()
+    _COLUMNS: ClassVar[dict[str, Column]] = {}
+
+    def __init__(self, reader: "Reader", offset: int, size: int) -> None:
+        """Private constructor. Use the accessor methods on tables or the root method on Reader to get an instance"""
+        self._reader = reader
+        self._offset = offset
+        self._size = size
+        if reader._pinning:
+            # Members are read when accessed, so the data must stay present
+            self._pin = reader._fill(offset, size)
+
+    def __reduce__(self) -> tuple:
+        return (type(self), (self._reader, self._offset, self._size))
+
+    def __str__(self):
+        o = []
+        for m in self._MEMBERS:
+            if getattr(self, "has_" + m, True):
+                o.append("%s: %s" % (m, getattr(self, m)))
+        return "{%s}" % ", ".join(o)
+
+    def _to_dict(self):
+        o = {}
+        for m in self._MEMBERS:
+            if getattr(self, "has_" + m, True):
+                v = getattr(self, m)
+                if hasattr(v, "_to_dict"):
+                    v = v._to_dict()
+                o[m] = v
+        return o
+
+    def _digest(self, h: Hash) -> None:
+        h.update(b"\xff\xe6")
+        for m in self._MEMBERS:
+            if getattr(self, "has_" + m, True):
+                digest(h, getattr(self, m))
+        h.update(b"\xff\xe7")
+
+    def _get_uint48_f(self, o: int) -> int:
+        return unpack48_from_(self._reader._data, self._offset + o)
+
+    def _get_int8(self, o: int, d: int) -> int:
+        return (
+            _INT8.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_uint8(self, o: int, d: int) -> int:
+        return (
+            _UINT8.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_int16(self, o: int, d: int) -> int:
+        return (
+            _INT16.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_uint16(self, o: int, d: int) -> int:
+        return (
+            _UINT16.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_int32(self, o: int, d: int) -> int:
+        return (
+            _INT32.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_uint32(self, o: int, d: int) -> int:
+        return (
+            _UINT32.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_uint48(self, o: int) -> int:
+        return (
+            unpack48_from_(self._reader._data, self._offset + o)
+            if o < self._size
+            else 0
+        )
+
+    def _get_int64(self, o: int, d: int) -> int:
+        return (
+            _INT64.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_uint64(self, o: int, d: int) -> int:
+        return (
+            _UINT64.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_float32(self, o: int, d: float) -> float:
+        return (
+            _FLOAT32.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_float64(self, o: int, d: float) -> float:
+        return (
+            _FLOAT64.unpack_from(self._reader._data, self._offset + o)[0]
+            if o < self._size
+            else d
+        )
+
+    def _get_bit(self, o: int, b: int, d: bool) -> bool:
+        return (
+            self._reader._data[self._offset + o] & (1 << b) != 0
+            if o < self._size
+            else d
+        )
+
+    def _get_ptr(self, o: int, magic: int) -> tuple[int, int]:
+        off = self._get_uint48_f(o)
+        if off == 0:
+            return (0, 0)
+        size = self._reader._read_size(off, magic)
+        return (off + 10, size)
+
+    def _get_ptr_inplace(self, o: int, magic: int) -> tuple[int, int]:
+        size = self._get_uint48_f(o)
+        self._reader._fill(self._offset + self._size, size)
+        return (self._offset + self._size, size)
+
+
+class _Verifier:
+    """Walks a message checking every magic, size and offset, see Reader.verify"""
+
+    def __init__(self, data: Buffer, max_depth: int, max_objects: int) -> None:
+        self.data = data
+        self.end = len(data)
+        self.max_depth = max_depth
+        self.max_objects = max_objects
+        self.seen: set[tuple[int, str, Any, bool]] = set()
+
+    def fail(self, msg: str) -> None:
+        raise Exception("Invalid message: %s" % msg)
+
+    def check(self, offset: int, size: int) -> None:
+        if offset < 10 or offset + size > self.end:
+            self.fail("object at %d of size %d is out of bounds" % (offset, size))
+
+    def pointer(self, p: Pointer, offset: int, depth: int) -> None:
+        """Verify the object of kind p with a header at offset"""
+        if offset == 0 or (p.kind == "table" and not p.list_ and p.type is None):
+            return
+        if depth > self.max_depth:
+            self.fail("nesting deeper than %d" % self.max_depth)
+        key = (offset, p.kind, p.type, p.list_)
+        if key in self.seen:
+            return
+        if len(self.seen) >= self.max_objects:
+            self.fail("more than %d objects" % self.max_objects)
+        self.seen.add(key)
+        if p.list_:
+            magic = DIRECT_LIST_MAGIC if p.kind == "direct" else LIST_MAGIC
+        elif p.kind == "table":
+            magic = p.type._MAGIC
+        elif p.kind == "text":
+            magic = TEXT_MAGIC
+        else:
+            magic = BYTES_MAGIC
+        self.check(offset, 10)
+        m, sizelow, sizehigh = _HEADER.unpack_from(self.data, offset)
+        if m != magic:
+            self.fail("expected magic %08X but got %08X at %d" % (magic, m, offset))
+        self.content(p, offset + 10, join48_(sizelow, sizehigh), depth)
+
+    def content(self, p: Pointer, offset: int, size: int, depth: int) -> None:
+        """Verify the content of an object of kind p, where size is the number
+        of elements of lists and the number of bytes otherwise"""
+        if p.list_:
+            self.list(p, offset, size, depth)
+        elif p.kind == "table":
+            self.check(offset, size)
+            if p.type is not None:
+                self.table(p.type, offset, size, depth)
+        elif p.kind == "text":
+            self.check(offset, size + 1)
+        else:
+            self.check(offset, size)
+
+    def table(self, t: type["TableIn"], offset: int, size: int, depth: int) -> None:
+        for p in t._POINTERS:
+            if p.kind == "union" and not p.list_:
+                if p.offset + 8 > size:
+                    continue
+                utype, lo, hi = _UNION.unpack_from(self.data, offset + p.offset)
+                if p.inplace:
+                    self.union(p.type, utype, offset + size, join48_(lo, hi), depth)
+                else:
+                    self.union(p.type, utype, join48_(lo, hi), None, depth + 1)
+            elif p.offset + 6 <= size:
+                v = unpack48_from_(self.data, offset + p.offset)
+                if p.inplace:
+                    self.content(p, offset + size, v, depth)
+                else:
+                    self.pointer(p, v, depth + 1)
+
+    def union(
+        self,
+        u: type["UnionIn"],
+        utype: int,
+        offset: int,
+        size: int | None,
+        depth: int,
+    ) -> None:
+        # Members unknown to the schema are left for newer readers
+        if utype == 0 or utype > len(u._POINTERS):
+            return
+        p = u._POINTERS[utype - 1]
+        if p is None:
+            return
+        if size is not None:
+            self.content(p, offset, size, depth)
+        else:
+            self.pointer(p, offset, depth)
+
+    def list(self, p: Pointer, offset: int, size: int, depth: int) -> None:
+        kind, t = p.kind, p.type
+        if kind == "basic":
+            self.check(offset, size * _CODECS[t].size)
+        elif kind == "bool":
+            self.check(offset, (size + 7) >> 3)
+        elif kind == "enum":
+            self.check(offset, size)
+        elif kind == "struct":
+            self.check(offset, size * t._WIDTH)
+        elif kind == "direct":
+            self.check(offset, 8)
+            magic, item_size = _DIRECT_HEADER.unpack_from(self.data, offset)
+            if t is None:
+                return
+            if magic != t._MAGIC:
+                self.fail(
+                    "expected magic %08X but got %08X at %d" % (t._MAGIC, magic, offset)
+                )
+            self.check(offset + 8, size * item_size)
+            if t._POINTERS:
+                for i in range(size):
+                    self.table(t, offset + 8 + i * item_size, item_size, depth + 1)
+        elif kind == "union":
+            self.check(offset, size * 8)
+            for i in range(size):
+                utype, lo, hi = _UNION.unpack_from(self.data, offset + i * 8)
+                self.union(t, utype, join48_(lo, hi), None, depth + 1)
+        else:
+            self.check(offset, size * 6)
+            e = p._replace(list_=False, inplace=False)
+            for i in range(size):
+                self.pointer(e, unpack48_from_(self.data, offset + i * 6), depth + 1)
+
+
+class _Walker:
+    """Finds the objects reachable from a table and the slots holding offsets of
+    them, see Writer.splice, Writer.embed and compact"""
+
+    def __init__(
+        self, data: Buffer, fill: Callable[[int, int], Any] | None = None
+    ) -> None:
+        """fill makes the data of an object present before it is read, and
+        keeps it while its result is referenced, like Reader._fill"""
+        self.data = data
+        self.fill = fill if fill is not None else lambda offset, size: None
+        # The start and end of each object, including its header, and of the
+        # inplace content of tables
+        self.spans: list[tuple[int, int]] = []
+        # The positions of the 48 bit offsets of objects
+        self.slots: list[int] = []
+        # False if some objects are unknown to the schema and were not visited
+        self.complete = True
+        self.seen: set[int] = set()
+
+    def pointer(self, p: Pointer, offset: int) -> None:
+        """Visit the object of kind p with a header at offset"""
+        if offset in self.seen:
+            return
+        self.seen.add(offset)
+        if p.list_:
+            magic = DIRECT_LIST_MAGIC if p.kind == "direct" else LIST_MAGIC
+        elif p.kind == "table":
+            magic = p.type._MAGIC if p.type is not None else None
+        elif p.kind == "text":
+            magic = TEXT_MAGIC
+        else:
+            magic = BYTES_MAGIC
+        self.fill(offset, 10)
+        m, sizelow, sizehigh = _HEADER.unpack_from(self.data, offset)
+        if magic is not None and m != magic:
+            raise Exception(
+                "Expected magic %08X but got %08X at %d" % (magic, m, offset)
+            )
+        size = join48_(sizelow, sizehigh)
+        self.spans.append((offset, self.content(p, offset + 10, size)))
+
+    def content(self, p: Pointer, offset: int, size: int) -> int:
+        """Visit the content of an object of kind p, and return its end"""
+        if p.list_:
+            return self.list(p, offset, size)
+        if p.kind == "table":
+            if p.type is not None:
+                self.table(p.type, offset, size)
+            return offset + size
+        if p.kind == "text":
+            return offset + size + 1
+        return offset + size
+
+    def table(self, t: type["TableIn"], offset: int, size: int) -> None:
+        if size > len(t._DEFAULT):
+            # Written with a newer schema, that may have more pointer members
+            self.complete = False
+        # Visiting the members may fill other data, so hold on to the table
+        pin = self.fill(offset, size)
+        for p in t._POINTERS:
+            if p.kind == "union" and not p.list_:
+                if p.offset + 8 > size:
+                    continue
+                utype, lo, hi = _UNION.unpack_from(self.data, offset + p.offset)
+                v = join48_(lo, hi)
+                if p.inplace:
+                    self.union(p.type, utype, offset + size, v)
+                elif v != 0:
+                    self.slots.append(offset + p.offset + 2)
+                    self.union(p.type, utype, v, None)
+            elif p.offset + 6 <= size:
+                v = unpack48_from_(self.data, offset + p.offset)
+                if p.inplace:
+                    self.spans.append(
+                        (offset + size, self.content(p, offset + size, v))
+                    )
+                elif v != 0:
+                    self.slots.append(offset + p.offset)
+                    self.pointer(p, v)
+        del pin
+
+    def union(
+        self, u: type["UnionIn"], utype: int, offset: int, size: int | None
+    ) -> None:
+        if utype == 0:
+            return
+        p = u._POINTERS[utype - 1] if utype <= len(u._POINTERS) else None
+        if p is None:
+            # A member unknown to the schema, or removed from it
+            self.complete = False
+        elif size is not None:
+            self.spans.append((offset, self.content(p, offset, size)))
+        else:
+            self.pointer(p, offset)
+
+    def list(self, p: Pointer, offset: int, size: int) -> int:
+        kind, t = p.kind, p.type
+        if kind == "basic":
+            return offset + size * _CODECS[t].size
+        if kind == "bool":
+            return offset + ((size + 7) >> 3)
+        if kind == "enum":
+            return offset + size
+        if kind == "struct":
+            return offset + size * t._WIDTH
+        if kind == "direct":
+            self.fill(offset, 8)
+            magic, item_size = _DIRECT_HEADER.unpack_from(self.data, offset)
+            if t is not None and magic != t._MAGIC:
+                raise Exception(
+                    "Expected magic %08X but got %08X at %d" % (t._MAGIC, magic, offset)
+                )
+            if t is not None and t._POINTERS:
+                for i in range(size):
+                    self.table(t, offset + 8 + i * item_size, item_size)
+            return offset + 8 + size * item_size
+        if kind == "union":
+            pin = self.fill(offset, size * 8)
+            for i in range(size):
+                utype, lo, hi = _UNION.unpack_from(self.data, offset + i * 8)
+                v = join48_(lo, hi)
+                if v != 0:
+                    self.slots.append(offset + i * 8 + 2)
+                    self.union(t, utype, v, None)
+            del pin
+            return offset + size * 8
+        e = p._replace(list_=False, inplace=False)
+        pin = self.fill(offset, size * 6)
+        for i, v in enumerate(_iter_offsets(self.data, offset, size)):
+            if v != 0:
+                self.slots.append(offset + i * 6)
+                self.pointer(e, v)
+        del pin
+        return offset + size * 6
+
+
+def compact(reader: "Reader", root_type: type["TableIn"]) -> bytes:
+    """Return the message of reader, with a root table of type root_type,
+    without the objects that can not be reached from the root.
+
+    Such objects are left behind when a member is set more than once. The
+    remaining objects keep their order, so inplace members still follow their
+    tables. The number of bytes reclaimed is the difference in size of the
+    messages"""
+    reader._fill(0, len(reader._data))
+    return _compact(_view(reader._data), root_type)
+
+
+def _compact(data: memoryview, root_type: type["TableIn"]) -> bytes:
+    magic, offsetlow, offsethigh = _HEADER.unpack_from(data, 0)
+    if magic != MESSAGE_MAGIC:
+        raise Exception("Expected magic %08X but got %08X" % (MESSAGE_MAGIC, magic))
+    root = join48_(offsetlow, offsethigh)
+    walker = _Walker(data)
+    walker.pointer(Pointer(0, "table", root_type, False, False), root)
+    if not walker.complete:
+        raise Exception("Cannot compact a message with members unknown to the schema")
+    # Copy the objects in runs of adjacent objects. An object at offset in the
+    # run starting at starts[i] is moved to offset - shifts[i]
+    out = bytearray(10)
+    starts: list[int] = []
+    shifts: list[int] = []
+    end = 0
+    for s, e in sorted(walker.spans):
+        if s > end:
+            starts.append(s)
+            shifts.append(s - len(out))
+        elif e <= end:
+            continue
+        else:
+            s = end
+        out += data[s:e]
+        end = e
+
+    def moved(offset: int) -> int:
+        return offset - shifts[bisect.bisect_right(starts, offset) - 1]
+
+    for slot in walker.slots:
+        pack48_into_(out, moved(slot), moved(unpack48_from_(data, slot)))
+    _HEADER.pack_into(out, 0, MESSAGE_MAGIC, *split48_(moved(root)))
+    return bytes(out)
+
+
+# The size and default of the fixed part of a table, the ranges in it holding
+# offsets or inplace sizes, and its pointer members
+_Plan = tuple[int, bytes, tuple[tuple[int, int], ...], Sequence[Pointer]]
+
+# Digest plans of table types, see _table_plan
+_PLANS: dict[type, _Plan] = {}
+
+
+def _table_plan(t: type["TableIn"]) -> _Plan:
+    """Return the digest plan of t, computing it on first use"""
+    plan = _PLANS.get(t)
+    if plan is None:
+        slots = tuple(
+            (p.offset + 2, p.offset + 8)
+            if p.kind == "union" and not p.list_
+            else (p.offset, p.offset + 6)
+            for p in t._POINTERS
+        )
+        plan = _PLANS[t] = (len(t._DEFAULT), t._DEFAULT, slots, t._POINTERS)
+    return plan
+
+
+class _Digester:
+    """Feeds the canonical digest of objects to a hash, see doc/digest.md"""
+
+    def __init__(self, h: Hash, reader: "Reader") -> None:
+        self.update = h.update
+        self.reader = reader
+        # The digester reads the message directly instead of through accessors
+        self.pin = reader._fill(0, len(reader._data))
+        self.data = _view(reader._data)
+
+    def table(self, t: type["TableIn"], offset: int, size: int) -> None:
+        default_size, default, slots, pointers = _table_plan(t)
+        if size >= default_size:
+            fixed = bytearray(self.data[offset : offset + default_size])
+        else:
+            fixed = bytearray(self.data[offset : offset + size])
+            fixed += default[size:]
+        for start, end in slots:
+            fixed[start:end] = bytes(end - start)
+        self.update(fixed)
+        end = offset + size
+        for p in pointers:
+            if p.kind == "union" and not p.list_:
+                if p.offset + 8 > size:
+                    continue
+                utype, lo, hi = _UNION.unpack_from(self.data, offset + p.offset)
+                self.union(p.type, utype, join48_(lo, hi), end if p.inplace else None)
+            else:
+                v = 0
+                if p.offset + 6 <= size:
+                    v = unpack48_from_(self.data, offset + p.offset)
+                if v == 0:
+                    self.update(b"\0")
+                elif p.inplace:
+                    self.update(b"\1")
+                    self.content(p, end, v)
+                else:
+                    self.pointer(p, v)
+
+    def union(
+        self, u: type["UnionIn"], utype: int, v: int, inplace_offset: int | None
+    ) -> None:
+        """Digest the member of a union, its type is part of the enclosing object"""
+        if utype == 0 or utype > len(u._POINTERS) or u._POINTERS[utype - 1] is None:
+            return
+        p = u._POINTERS[utype - 1]
+        if v == 0:
+            self.update(b"\0")
+        elif inplace_offset is not None:
+            self.update(b"\1")
+            self.content(p, inplace_offset, v)
+        else:
+            self.pointer(p, v)
+
+    def pointer(self, p: Pointer, offset: int) -> None:
+        if p.list_:
+            magic = DIRECT_LIST_MAGIC if p.kind == "direct" else LIST_MAGIC
+        elif p.kind == "table":
+            if p.type is None:
+                self.update(b"\1")
+                return
+            magic = p.type._MAGIC
+        elif p.kind == "text":
+            magic = TEXT_MAGIC
+        else:
+            magic = BYTES_MAGIC
+        self.update(b"\1")
+        self.content(p, offset + 10, self.reader._read_size(offset, magic))
+
+    def content(self, p: Pointer, offset: int, size: int) -> None:
+        if p.list_:
+            self.list(p, offset, size)
+        elif p.kind == "table":
+            if p.type is not None:
+                self.table(p.type, offset, size)
+        else:
+            self.update(_UINT64.pack(size))
+            self.update(self.data[offset : offset + size])
+
+    def list(self, p: Pointer, offset: int, size: int) -> None:
+        kind, t = p.kind, p.type
+        data = self.data
+        self.update(_UINT64.pack(size))
+        if kind == "basic":
+            self.update(data[offset : offset + size * _CODECS[t].size])
+        elif kind == "bool":
+            full = size >> 3
+            self.update(data[offset : offset + full])
+            if size & 7:
+                # Padding bits of the last byte are not part of the digest
+                last = data[offset + full] & ((1 << (size & 7)) - 1)
+                self.update(bytes((last,)))
+        elif kind == "enum":
+            self.update(data[offset : offset + size])
+        elif kind == "struct":
+            self.update(data[offset : offset + size * t._WIDTH])
+        elif kind == "direct":
+            if t is None:
+                return
+            _, item_size = _DIRECT_HEADER.unpack_from(data, offset)
+            for i in range(size):
+                self.table(t, offset + 8 + i * item_size, item_size)
+        elif kind == "union":
+            for i in range(size):
+                utype, lo, hi = _UNION.unpack_from(data, offset + i * 8)
+                self.update(data[offset + i * 8 : offset + i * 8 + 2])
+                self.union(t, utype, join48_(lo, hi), None)
+        else:
+            e = p._replace(list_=False, inplace=False)
+            for i in range(size):
+                v = unpack48_from_(data, offset + i * 6)
+                if v == 0:
+                    self.update(b"\0")
+                else:
+                    self.pointer(e, v)
+
+
+def fast_digest(h: Hash, v: "TableIn | UnionIn", legacy: bool = False) -> None:
+    """Feed a digest of the table or union v to the hash h, such as a hashlib
+    object, in streaming mode.
+
+    By default the canonical digest format described in doc/digest.md is used,
+    which hashes the raw bytes of fixed size members and lists of basic types,
+    bools, enums and structs without decoding them. If legacy is True the
+    escaped format of digest is used instead"""
+    if legacy:
+        digest(h, v)
+        return
+    d = _Digester(h, v._reader)
+    if isinstance(v, TableIn):
+        d.table(type(v), v._offset, v._size)
+    elif isinstance(v, UnionIn):
+        d.update(_UINT16.pack(v._type))
+        if v._size is None:
+            d.union(type(v), v._type, v._offset, None)
+        else:
+            d.union(type(v), v._type, v._size, v._offset)
+    else:
+        raise TypeError("Expected a table or a union")
+
+
+# Text buffered by dump_json before it is written to the file
+_JSON_BUFFER = 1 << 16
+_JSON_BOOL = {False: "false", True: "true"}
+
+
+def _json_float(v: float) -> str:
+    if v != v:
+        return "NaN"
+    if v == math.inf:
+        return "Infinity"
+    if v == -math.inf:
+        return "-Infinity"
+    return float.__repr__(v)
+
+
+class _JsonDumper:
+    """Writes the JSON text of objects read from a message to a file"""
+
+    def __init__(self, fp: TextIO, chunk_size: int) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.parts: list[str] = []
+        self.used = 0
+
+    def write(self, s: str) -> None:
+        self.parts.append(s)
+        self.used += len(s)
+        if self.used >= _JSON_BUFFER:
+            self.flush()
+
+    def flush(self) -> None:
+        self.fp.write("".join(self.parts))
+        self.parts.clear()
+        self.used = 0
+
+    def value(self, v: Any) -> None:
+        if v is None:
+            self.write("null")
+        elif v is True or v is False:
+            self.write(_JSON_BOOL[v])
+        elif isinstance(v, ListIn):
+            self.list(v)
+        elif isinstance(v, TableIn):
+            self.table(v)
+        elif isinstance(v, UnionIn):
+            self.union(v)
+        elif isinstance(v, (StructType, dict)):
+            if isinstance(v, StructType):
+                v = v._to_dict()
+            self.write("{")
+            for i, (k, x) in enumerate(v.items()):
+                self.write('%s"%s": ' % (", " if i else "", k))
+                self.value(x)
+            self.write("}")
+        elif isinstance(v, str):
+            self.write(json.encoder.encode_basestring_ascii(v))
+        elif isinstance(v, (bytes, memoryview)):
+            self.write('"%s"' % base64.b64encode(v).decode("ascii"))
+        elif isinstance(v, float):
+            self.write(_json_float(v))
+        elif isinstance(v, int):
+            self.write(int.__repr__(v))
+        else:
+            raise TypeError("Cannot write %s as JSON" % type(v).__name__)
+
+    def table(self, v: "TableIn") -> None:
+        if not v._POINTERS:
+            # Tables without pointers are small, so their dict is cheap
+            self.value(v._to_dict())
+            return
+        self.write("{")
+        sep = ""
+        for m in v._MEMBERS:
+            if not getattr(v, "has_" + m, True):
+                continue
+            self.write('%s"%s": ' % (sep, m))
+            sep = ", "
+            # Members that are empty tables have no accessor
+            self.value(getattr(v, m, {}))
+        self.write("}")
+
+    def union(self, v: "UnionIn") -> None:
+        if v._type == 0:
+            self.write("{}")
+            return
+        m = v._MEMBERS[v._type - 1]
+        self.write('{"%s": ' % m)
+        self.value(getattr(v, m, None))
+        self.write("}")
+
+    def list(self, v: "ListIn[Any]") -> None:
+        d = v._dtype
+        self.write("[")
+        if d is bool or isinstance(d, str):
+            # Lists of numbers, bools and enums are formatted a chunk at a time
+            if d is bool:
+                fmt = _JSON_BOOL.__getitem__
+            elif d in ("<f", "<d"):
+                fmt = float.__repr__
+            else:
+                fmt = int.__repr__
+            sep = ""
+            for c in v.chunks(self.chunk_size):
+                items = c.tolist()
+                s = ", ".join(map(fmt, items))
+                if fmt is float.__repr__ and "n" in s:
+                    s = ", ".join(map(_json_float, items))
+                if items:
+                    self.write(sep + s)
+                    sep = ", "
+                if len(items) < len(c):
+                    # Enum lists end at the first missing element
+                    break
+        else:
+            for i, x in enumerate(v):
+                if i:
+                    self.write(", ")
+                self.value(x)
+        self.write("]")
+
+
+def dump_json(v: Any, fp: TextIO, chunk_size: int = _CHUNK) -> None:
+    """Write v, typically the root table of a message, to the text file fp as
+    JSON without building the intermediate dicts of _to_dict.
+
+    The output is the same as json.dump(v._to_dict(), fp) would give, except
+    that bytes are written as base64 encoded strings. Lists of numbers, bools
+    and enums are formatted chunk_size elements at a time, and the text is
+    written to fp in pieces, so memory use does not grow with the message"""
+    d = _JsonDumper(fp, chunk_size)
+    d.value(v)
+    d.flush()
+
+
+class Reader:
+    """Responsible for reading a message"""
+
+    def __init__(self, data: Buffer, zero_copy: bool = False) -> None:
+        """data is the message to read from. It may be any object supporting the
+        buffer protocol, such as bytes, bytearray, memoryview or mmap.mmap.
+
+        If zero_copy is True bytes members are returned as memoryview slices of
+        data instead of bytes copies. Note that an mmap.mmap cannot be closed
+        while such slices are alive."""
+        self._zero_copy = zero_copy
+        self._data = memoryview(data).cast("B") if zero_copy else data
+        self._trusted = False
+        # The root type the message was verified with
+        self._verified: type[TableIn] | None = None
+
+    def verify(
+        self, root_type: type[TI], max_depth: int = 64, max_objects: int = 1 << 24
+    ) -> None:
+        """Check the whole message, read with root_type, up front.
+
+        Every object reachable from the root is visited once, checking its
+        magic and that it lies within the message. Objects nested deeper than
+        max_depth, or more than max_objects objects, are rejected as well.
+        Raises an exception if the message is invalid. Otherwise the reader is
+        marked as trusted and skips the magic checks on later accesses, as long
+        as the root is read with root_type"""
+        v = _Verifier(self._data, max_depth, max_objects)
+        if len(self._data) < 10:
+            v.fail("too short")
+        magic, offsetlow, offsethigh = _HEADER.unpack_from(self._data, 0)
+        if magic != MESSAGE_MAGIC:
+            v.fail("expected magic %08X but got %08X" % (MESSAGE_MAGIC, magic))
+        offset = join48_(offsetlow, offsethigh)
+        if offset == 0:
+            v.fail("missing root")
+        v.pointer(Pointer(0, "table", root_type, False, False), offset, 0)
+        self._trusted = True
+        self._verified = root_type
+
+    # Whether objects must keep the result of _fill for their data to stay
+    # present, see CompressedReader
+    _pinning = False
+
+    def _fill(self, offset: int, size: int) -> Any:
+        """Make sure size bytes of data from offset are present, at least until
+        the next call or while the returned object is kept. The data of a plain
+        reader always is, see CompressedReader"""
+        return None
+
+    def _export(self, offset: int, size: int) -> Buffer:
+        """Return a buffer holding the message, for views of the size bytes of
+        data from offset that may outlive the objects they are made through"""
+        return self._data
+
+    def _read_size(self, offset: int, magic: int):
+        # Missing objects, such as unset elements of bytes lists, are allowed by
+        # verify, and rejected by the magic check below
+        if self._trusted and offset != 0:
+            return unpack48_from_(self._data, offset + 4)
+        m, sizelow, sizehigh = _HEADER.unpack_from(self._data, offset)
+        if m != magic:
+            raise Exception("Expected magic %08X but got %08X" % (magic, m))
+        return join48_(sizelow, sizehigh)
+
+    def _get_text(self, offset: int, size: int) -> str:
+        return str(self._data[offset : offset + size], "utf-8")
+
+    def _get_bytes(self, offset: int, size: int) -> bytes | memoryview:
+        if self._zero_copy:
+            return self._data[offset : offset + size]
+        return bytes(self._data[offset : offset + size])
+
+    def _get_table_list(
+        self, t: type[TI], off: int, size: int, direct: bool = False
+    ) -> ListIn[TI]:
+        if not direct:
+
+            def getter(r: "Reader", s: int, i: int) -> TI:
+                ooo = unpack48_from_(r._data, s + 6 * i)
+                if ooo == 0:
+                    return t(r, 0, 0)
+                sss = r._read_size(ooo, t._MAGIC)
+                return t(r, ooo + 10, sss)
+
+            def iterator(r: "Reader", s: int, n: int) -> Iterator[TI]:
+                for ooo in _iter_offsets(r._data, s, n):
+                    if ooo == 0:
+                        yield t(r, 0, 0)
+                    else:
+                        yield t(r, ooo + 10, r._read_size(ooo, t._MAGIC))
+
+            return ListIn[TI](
+                self,
+                size,
+                off,
+                getter,
+                lambda r, s, i: unpack48_from_(r._data, s + 6 * i) != 0,
+                False,
+                iterator=iterator,
+                width=6,
+                source=("_get_table_list", (t, off, size, direct)),
+            )
+        else:
+            magic, item_size = _DIRECT_HEADER.unpack_from(self._data, off)
+            if magic != t._MAGIC:
+                raise Exception(
+                    "Expected scalgoproto magic %08X but got %08X" % (t._MAGIC, magic)
+                )
+
+            if off + 8 + item_size * size > len(self._data):
+                raise Exception("Invalid table size")
+
+            return ListIn[TI](
+                self,
+                size,
+                off + 8,
+                lambda r, s, i: t(r, s + i * item_size, item_size),
+                lambda r, s, i: True,
+                False,
+                iterator=lambda r, s, n: (
+                    t(r, o, item_size) for o in range(s, s + n * item_size, item_size)
+                ),
+                width=item_size,
+                table=t,
+                source=("_get_table_list", (t, off, size, direct)),
+            )
+
+    def _get_union_list(self, t: type[UI], off: int, size: int) -> ListIn[UI]:
+        def getter(r: "Reader", s: int, i: int) -> UI:
+            base = s + i * 8
+            utype = _UINT16.unpack_from(r._data, base)[0]
+            uoff = unpack48_from_(r._data, base + 2)
+            return t(r, utype, uoff)
+
+        return ListIn[UI](
+            self,
+            size,
+            off,
+            getter,
+            lambda r, s, i: True,
+            False,
+            iterator=lambda r, s, n: (
+                t(r, utype, lo | hi << 32)
+                for utype, lo, hi in _UNION.iter_unpack(_view(r._data)[s : s + n * 8])
+            ),
+            width=8,
+            source=("_get_union_list", (t, off, size)),
+        )
+
+    def _get_bool_list(self, off: int, size: int) -> ListIn[bool]:
+        return ListIn[bool](
+            self,
+            size,
+            off,
+            lambda r, s, i: (r._data[s + (i >> 3)] >> (i & 7)) & 1 != 0,
+            lambda r, s, i: True,
+            False,
+            bool,
+            lambda r, s, n: itertools.islice(
+                itertools.chain.from_iterable(
+                    map(_BOOL_BYTES.__getitem__, _view(r._data)[s : s + ((n + 7) >> 3)])
+                ),
+                n,
+            ),
+            source=("_get_bool_list", (off, size)),
+        )
+
+    def _get_int_list(self, f: str, w: int, off: int, size: int) -> ListIn[int]:
+        c = _CODECS[f]
+        return ListIn[int](
+            self,
+            size,
+            off,
+            lambda r, s, i: c.unpack_from(r._data, s + i * w)[0],
+            lambda r, s, i: True,
+            False,
+            "<" + f,
+            lambda r, s, n: _iter_numbers(f, w, r._data, s, n),
+            w,
+            source=("_get_int_list", (f, w, off, size)),
+        )
+
+    def _get_float_list(self, f: str, w: int, off: int, size: int) -> ListIn[float]:
+        c = _CODECS[f]
+        return ListIn[float](
+            self,
+            size,
+            off,
+            lambda r, s, i: c.unpack_from(r._data, s + i * w)[0],
+            lambda r, s, i: not math.isnan(c.unpack_from(r._data, s + i * w)[0]),
+            False,
+            "<" + f,
+            lambda r, s, n: _iter_numbers(f, w, r._data, s, n),
+            w,
+            source=("_get_float_list", (f, w, off, size)),
+        )
+
+    def _get_struct_list(self, t: type[S], off: int, size: int) -> ListIn[S]:
+        def iterator(r: "Reader", s: int, n: int) -> Iterator[S]:
+            if t._WIDTH == 0:
+                return (t._read(r, s) for _ in range(n))
+            data = _view(r._data)[s : s + n * t._WIDTH]
+            return map(t._unpack, t._STRUCT.iter_unpack(data))
+
+        return ListIn[S](
+            self,
+            size,
+            off,
+            lambda r, s, i: t._read(r, s + i * t._WIDTH),
+            lambda r, s, i: True,
+            False,
+            t,
+            iterator,
+            t._WIDTH,
+            source=("_get_struct_list", (t, off, size)),
+        )
+
+    def _get_enum_list(self, t: type[E], off: int, size: int) -> ListIn[E]:
+        def iterator(r: "Reader", s: int, n: int) -> Iterator[E]:
+            # Like indexing, iteration ends at the first missing element
+            data = bytes(_view(r._data)[s : s + n]).split(b"\xff", 1)[0]
+            members = list(t)
+            if data and max(data) >= len(members):
+                return map(t, data)
+            return map(members.__getitem__, data)
+
+        return ListIn[E](
+            self,
+            size,
+            off,
+            lambda r, s, i: t(r._data[s + i]),
+            lambda r, s, i: r._data[s + i] != 255,
+            True,
+            "B",
+            iterator,
+            1,
+            source=("_get_enum_list", (t, off, size)),
+        )
+
+    def _get_text_list(self, off: int, size: int) -> ListIn[str]:
+        def getter(r: "Reader", s: int, i: int) -> str:
+            ooo = unpack48_from_(r._data, s + 6 * i)
+            if ooo == 0:
+                return ""
+            sss = r._read_size(ooo, TEXT_MAGIC)
+            return r._get_text(ooo + 10, sss)
+
+        def iterator(r: "Reader", s: int, n: int) -> Iterator[str]:
+            for ooo in _iter_offsets(r._data, s, n):
+                if ooo == 0:
+                    yield ""
+                else:
+                    yield r._get_text(ooo + 10, r._read_size(ooo, TEXT_MAGIC))
+
+        return ListIn[str](
+            self,
+            size,
+            off,
+            getter,
+            lambda r, s, i: unpack48_from_(r._data, s + 6 * i) != 0,
+            False,
+            iterator=iterator,
+            width=6,
+            source=("_get_text_list", (off, size)),
+        )
+
+    def _get_bytes_list(self, off: int, size: int) -> ListIn[bytes | memoryview]:
+        def getter(r: "Reader", s: int, i: int) -> bytes | memoryview:
+            ooo = unpack48_from_(r._data, s + 6 * i)
+            sss = r._read_size(ooo, BYTES_MAGIC)
+            return r._get_bytes(ooo + 10, sss)
+
+        def iterator(r: "Reader", s: int, n: int) -> Iterator[bytes | memoryview]:
+            for ooo in _iter_offsets(r._data, s, n):
+                yield r._get_bytes(ooo + 10, r._read_size(ooo, BYTES_MAGIC))
+
+        return ListIn[bytes | memoryview](
+            self,
+            size,
+            off,
+            getter,
+            lambda r, s, i: unpack48_from_(r._data, s + 6 * i) != 0,
+            False,
+            iterator=iterator,
+            width=6,
+            source=("_get_bytes_list", (off, size)),
+        )
+
+    def root(self, type: type[TI]) -> TI:
+        """Return root node of message, of type type"""
+        magic, offsetlow, offsethigh = _HEADER.unpack_from(self._data, 0)
+        offset = join48_(offsetlow, offsethigh)
+        if magic != MESSAGE_MAGIC:
+            if magic == 0xFD2FB528:
+                raise Exception(
+                    "Expected scalgoproto magic %08X " % MESSAGE_MAGIC
+                    + "but got the zstd magic instead (%08X). " % magic
+                    + "Decompress the data with zstd.decompress() first."
+                )
+            if magic == COMPRESSED_MAGIC:
+                raise Exception(
+                    "Expected scalgoproto magic %08X " % MESSAGE_MAGIC
+                    + "but got a compressed message (%08X). " % magic
+                    + "Read it with CompressedReader instead."
+                )
+            raise Exception(
+                "Expected scalgoproto magic %08X but got %08X" % (MESSAGE_MAGIC, magic)
+            )
+        if self._trusted and type is not self._verified:
+            # Only the objects reached from the verified root type were checked
+            self._trusted = False
+        size = self._read_size(offset, type._MAGIC)
+        return type(self, offset + 10, size)
+
+
+class TextOut:
+    def __init__(self, offset: int) -> None:
+        self._offset = offset
+
+
+class BytesOut:
+    def __init__(self, offset: int) -> None:
+        self._offset = offset
+
+
+class TableOut:
+    __slots__ = ["_writer", "_offset"]
+    _MAGIC: ClassVar[int] = 0
+    _SIZE: ClassVar[int] = 0
+    _DEFAULT: ClassVar[bytes] = b""
+    _IN: ClassVar[type[TableIn]] = TableIn
+
+    def __init__(
+        self, writer: "Writer", with_header: bool = True, offset: int | None = None
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        assert self._SIZE == len(self._DEFAULT)
+        self._writer = writer
+        if offset is not None:
+            self._offset = offset
+        else:
+            self._writer._reserve(self._SIZE + 10)
+            if with_header:
+                sizelow, sizehigh = split48_(self._SIZE)
+                writer._write(_HEADER.pack(self._MAGIC, sizelow, sizehigh))
+            self._offset = writer._used
+            writer._write(self._DEFAULT)
+
+    @classmethod
+    def from_dict(cls: type[TO], writer: "Writer", d: dict[str, Any]) -> TO:
+        """Construct a table in writer from d, which maps member names to values
+        as returned by TableIn._to_dict. Members missing from d get no value,
+        and keys that are not members are ignored"""
+        res = writer.construct_table(cls)
+        res._from_dict(d)
+        return res
+
+    @abstractmethod
+    def _from_dict(self, d: dict[str, Any]) -> None:
+        """Set the members of the table from d, see from_dict"""
+
+    def _copy_fixed(self, i: TableIn) -> bool:
+        """Copy the fixed size part of i, if it is the same table, in one go.
+
+        The slots of pointer and inplace members are cleared afterwards, since
+        they must be copied member by member. Returns False if i is another
+        table"""
+        if i._MAGIC != self._MAGIC:
+            return False
+        size = min(i._size, self._SIZE)
+        o = self._offset
+        data = self._writer._data
+        data[o : o + size] = _view(i._reader._data)[i._offset : i._offset + size]
+        for p in self._IN._POINTERS:
+            w = 8 if p.kind == "union" and not p.list_ else 6
+            data[o + p.offset : o + p.offset + w] = bytes(w)
+        return True
+
+    def _set_int8(self, o: int, v: int) -> None:
+        _INT8.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_uint8(self, o: int, v: int) -> None:
+        _UINT8.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_int16(self, o: int, v: int) -> None:
+        _INT16.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_uint16(self, o: int, v: int) -> None:
+        _UINT16.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_int32(self, o: int, v: int) -> None:
+        _INT32.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_uint32(self, o: int, v: int) -> None:
+        _UINT32.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_uint48(self, o: int, v: int) -> None:
+        pack48_into_(self._writer._data, self._offset + o, v)
+
+    def _set_int64(self, o: int, v: int) -> None:
+        _INT64.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_uint64(self, o: int, v: int) -> None:
+        _UINT64.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_float32(self, o: int, v: float) -> None:
+        _FLOAT32.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_float64(self, o: int, v: float) -> None:
+        _FLOAT64.pack_into(self._writer._data, self._offset + o, v)
+
+    def _set_bit(self, o: int, b: int) -> None:
+        self._writer._data[self._offset + o] ^= 1 << b
+
+    def _unset_bit(self, o: int, b: int) -> None:
+        self._writer._data[self._offset + o] &= ~(1 << b)
+
+    def _set_table(self, o: int, v: TO) -> None:
+        pack48_into_(self._writer._data, self._offset + o, v._offset - 10)
+
+    def _set_text(self, o: int, v: TextOut | str) -> None:
+        if not isinstance(v, TextOut):
+            v = self._writer.construct_text(v)
+        pack48_into_(self._writer._data, self._offset + o, v._offset - 10)
+
+    def _set_bytes(self, o: int, v: BytesOut | bytes) -> None:
+        if not isinstance(v, BytesOut):
+            v = self._writer.construct_bytes(v)
+        pack48_into_(self._writer._data, self._offset + o, v._offset - 10)
+
+    def _set_list(self, o: int, v: "OutList") -> None:
+        pack48_into_(self._writer._data, self._offset + o, v._offset - 10)
+
+    def _get_uint16(self, o: int) -> int:
+        return _UINT16.unpack_from(self._writer._data, self._offset + o)[0]
+
+    def _add_inplace_text(self, o: int, t: str) -> None:
+        assert self._writer._used == self._offset + self._SIZE, (
+            "No object may be created between table and its implace text"
+        )
+        tt = t.encode("utf-8")
+        pack48_into_(self._writer._data, self._offset + o, len(tt))
+        self._writer._reserve(len(tt) + 1)
+        self._writer._write(tt)
+        self._writer._write(b"\0")
+
+    def _add_inplace_bytes(self, o: int, t: bytes) -> None:
+        assert self._writer._used == self._offset + self._SIZE, (
+            "No object may be created between table and its implace bytes"
+        )
+        pack48_into_(self._writer._data, self._offset + o, len(t))
+        self._writer._reserve(len(t))
+        self._writer._write(t)
+
+    def _set_inplace_list(self, o: int, size: int) -> None:
+        pack48_into_(self._writer._data, self._offset + o, size)
+
+
+class UnionOut:
+    __slots__ = ["_writer", "_offset", "_end"]
+
+    def __init__(self, writer: "Writer", offset: int, end: int) -> None:
+        self._writer = writer
+        self._offset = offset
+        self._end = end
+
+    def _set(self, idx: int, offset: int) -> None:
+        offsetlow, offsethigh = split48_(offset)
+        _UNION.pack_into(self._writer._data, self._offset, idx, offsetlow, offsethigh)
+
+    def _set_text(self, idx: int, v: TextOut | str) -> None:
+        if not isinstance(v, TextOut):
+            v = self._writer.construct_text(v)
+        self._set(idx, v._offset - 10)
+
+    def _set_bytes(self, idx: int, v: BytesOut | bytes) -> None:
+        if not isinstance(v, BytesOut):
+            v = self._writer.construct_bytes(v)
+        self._set(idx, v._offset - 10)
+
+    def _add_inplace_text(self, idx: int, v: str) -> None:
+        assert self._writer._used == self._end, (
+            "No object may be created between table and its implace text"
+        )
+        tt = v.encode("utf-8")
+        self._set(idx, len(tt))
+        self._writer._reserve(len(tt) + 1)
+        self._writer._write(tt)
+        self._writer._write(b"\0")
+
+    def _add_inplace_bytes(self, idx: int, t: bytes) -> None:
+        assert self._writer._used == self._end, (
+            "No object may be created between table and its implace bytes"
+        )
+        self._set(idx, len(t))
+        self._writer._reserve(len(t))
+        self._writer._write(t)
+
+
+class OutList:
+    _offset: int = 0
+    _size: int = 0
+
+    def __init__(
+        self, writer: "Writer", d: bytes, size: int, with_weader: bool
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        self._writer = writer
+        writer._reserve(len(d) + 10)
+        if with_weader:
+            sizelow, sizehigh = split48_(size)
+            writer._write(_HEADER.pack(LIST_MAGIC, sizelow, sizehigh))
+        self._offset = writer._used
+        self._size = size
+        writer._write(d)
+
+    def __len__(self):
+        return self._size
+
+    def _copy(self, inp: ListIn) -> None:
+        assert self._size == inp._size
+        for i in range(self._size):
+            self[i] = inp[i]
+
+    def _copy_raw(self, inp: ListIn, size: int) -> None:
+        """Copy the first size bytes of the payload of inp in one go"""
+        assert self._size == inp._size
+        self._writer._data[self._offset : self._offset + size] = _view(
+            inp._reader._data
+        )[inp._offset : inp._offset + size]
+
+
+class BasicListOut(OutList, Generic[B]):
+    def __init__(
+        self,
+        writer: "Writer",
+        e: str,
+        w: int,
+        size: int,
+        with_header: bool = True,
+        data: bytes | None = None,
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        if data is None:
+            data = b"\0" * w * size
+        super().__init__(writer, data, size, with_header)
+        self._e = e
+        self._c = _CODECS[e]
+        self._w = w
+
+    @classmethod
+    def _from(
+        cls, writer: "Writer", e: str, w: int, values: Any, with_header: bool = True
+    ) -> "BasicListOut[Any]":
+        """Private constructor writing the payload of values in one go"""
+        data = _encode_basic(e, w, values)
+        return cls(writer, e, w, len(data) // w, with_header, data)
+
+    def __setitem__(self, index: int, value: B) -> None:
+        """Add value to list at index"""
+        assert 0 <= index < self._size
+        self._c.pack_into(self._writer._data, self._offset + index * self._w, value)
+
+    def _copy(self, inp: ListIn) -> None:
+        if inp._dtype == "<" + self._e and inp._range is None:
+            self._copy_raw(inp, self._size * self._w)
+        else:
+            super()._copy(inp)
+
+
+class BoolListOut(OutList):
+    def __init__(
+        self,
+        writer: "Writer",
+        size: int,
+        with_header: bool = True,
+        data: bytes | None = None,
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        if data is None:
+            data = b"\0" * ((size + 7) >> 3)
+        super().__init__(writer, data, size, with_header)
+
+    @classmethod
+    def _from(
+        cls, writer: "Writer", values: Any, with_header: bool = True
+    ) -> "BoolListOut":
+        """Private constructor writing the payload of values in one go"""
+        data, size = _encode_bool(values)
+        return cls(writer, size, with_header, data)
+
+    def __setitem__(self, index: int, value: bool) -> None:
+        """Add value to list at index"""
+        assert 0 <= index < self._size
+        if value:
+            self._writer._data[self._offset + (index >> 3)] |= 1 << (index & 7)
+        else:
+            self._writer._data[self._offset + (index >> 3)] &= ~(1 << (index & 7))
+
+    def _copy(self, inp: ListIn) -> None:
+        if inp._dtype is bool and inp._range is None:
+            self._copy_raw(inp, (self._size + 7) >> 3)
+        else:
+            super()._copy(inp)
+
+
+class EnumListOut(OutList, Generic[E]):
+    def __init__(
+        self,
+        writer: "Writer",
+        e: type[E],
+        size: int,
+        withHeader: bool = True,
+        data: bytes | None = None,
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        if data is None:
+            data = b"\xff" * size
+        super().__init__(writer, data, size, withHeader)
+
+    @classmethod
+    def _from(
+        cls, writer: "Writer", e: type[E], values: Any, with_header: bool = True
+    ) -> "EnumListOut[E]":
+        """Private constructor writing the payload of values in one go"""
+        data = _encode_enum(values)
+        return cls(writer, e, len(data), with_header, data)
+
+    def __setitem__(self, index: int, value: E) -> None:
+        """Add value to list at index"""
+        self._writer._data[self._offset + index] = int(value)
+
+    def _copy(self, inp: ListIn) -> None:
+        if inp._dtype == "B" and inp._range is None:
+            self._copy_raw(inp, self._size)
+        else:
+            super()._copy(inp)
+
+
+class StructListOut(OutList, Generic[S]):
+    def __init__(
+        self,
+        writer: "Writer",
+        s: type[S],
+        size: int,
+        with_header: bool = True,
+        data: bytes | None = None,
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        if data is None:
+            data = b"\0" * s._WIDTH * size
+        super().__init__(writer, data, size, with_header)
+        self._s = s
+
+    @classmethod
+    def _from(
+        cls, writer: "Writer", s: type[S], values: Any, with_header: bool = True
+    ) -> "StructListOut[S]":
+        """Private constructor writing values directly into the payload. numpy
+        structured arrays are converted to the packed layout by field position
+        and copied in one go"""
+        if _is_numpy(values):
+            import numpy
+
+            data = numpy.asarray(values, numpy_dtype(s)).tobytes()
+            return cls(writer, s, len(data) // s._WIDTH, with_header, data)
+        if not isinstance(values, Sequence):
+            values = list(values)
+        res = cls(writer, s, len(values), with_header)
+        o, w, write = res._offset, s._WIDTH, s._write
+        for i, v in enumerate(values):
+            write(writer, o + i * w, v)
+        return res
+
+    def __setitem__(self, index: int, value: S) -> None:
+        """Add value to list at index"""
+        assert 0 <= index < self._size
+        self._s._write(self._writer, self._offset + index * self._s._WIDTH, value)
+
+    def _copy(self, inp: ListIn) -> None:
+        t = inp._dtype
+        if inp._range is None and (
+            t is self._s
+            or (
+                isinstance(t, type)
+                and issubclass(t, StructType)
+                and t._STRUCT.format == self._s._STRUCT.format
+            )
+        ):
+            self._copy_raw(inp, self._size * self._s._WIDTH)
+        else:
+            super()._copy(inp)
+
+
+class TableListOut(OutList, Generic[TO]):
+    def __init__(
+        self, writer: "Writer", t: type[TO], size: int, with_header: bool = True
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        super().__init__(writer, b"\0\0\0\0\0\0" * size, size, with_header)
+        self.table = t
+
+    def __setitem__(self, index: int, value: TO) -> None:
+        """Add value to list at index"""
+        assert 0 <= index < self._size
+        if isinstance(value, self.table._IN):
+            self.add(index)._copy(value)
+            return
+        assert isinstance(value, self.table)
+        pack48_into_(self._writer._data, self._offset + index * 6, value._offset - 10)
+
+    def add(self, index: int) -> TO:
+        assert 0 <= index < self._size
+        res = self._writer.construct_table(self.table)
+        self[index] = res
+        return res
+
+    def _from_dict(self, values: Sequence[dict[str, Any] | None]) -> None:
+        for i, v in enumerate(values):
+            if v is not None:
+                self.add(i)._from_dict(v)
+
+
+class DirectTableListOut(OutList, Generic[TO]):
+    def __init__(
+        self,
+        writer: "Writer",
+        t: type[TO],
+        size: int,
+        with_header: bool = True,
+        data: bytes | None = None,
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        self._writer = writer
+
+        writer._reserve(t._SIZE * size + 18)
+        if with_header:
+            sizelow, sizehigh = split48_(size)
+            writer._write(_HEADER.pack(DIRECT_LIST_MAGIC, sizelow, sizehigh))
+
+        self._offset = writer._used
+        self._size = size
+        writer._write(_DIRECT_HEADER.pack(t._MAGIC, t._SIZE))
+        writer._write(t._DEFAULT * size if data is None else data)
+        self._t = t
+
+    @classmethod
+    def _from(
+        cls, writer: "Writer", t: type[TO], values: Any, with_header: bool = True
+    ) -> "DirectTableListOut[TO]":
+        """Private constructor writing values directly into the payload. The
+        tables are built in a numpy array of numpy_table_dtype(t), starting from
+        their defaults, with one assignment per column, and copied in one go"""
+        import numpy
+
+        if hasattr(values, "dtype"):
+            names = values.dtype.names or ()
+            columns = {n: values[n] for n in names}
+        else:
+            columns = {n: numpy.asarray(v) for n, v in values.items()}
+        sizes = {len(v) for v in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError("Columns have different lengths %s" % sorted(sizes))
+        size = sizes.pop() if sizes else 0
+        layout = t._IN._COLUMNS
+        rows = numpy.frombuffer(
+            bytearray(t._DEFAULT * size), numpy_table_dtype(t), size
+        )
+        raw = rows.view(numpy.uint8).reshape(size, t._SIZE)
+
+        def set_bits(o: int, bit: int, v: Any) -> None:
+            b = raw[:, o]
+            b &= numpy.uint8(~(1 << bit) & 0xFF)
+            b |= numpy.asarray(v, numpy.bool_).astype(numpy.uint8) << bit
+
+        masks = []
+        for n, v in columns.items():
+            c = layout.get(n)
+            if c is not None:
+                if c.kind == "bool":
+                    set_bits(c.offset, c.bit, v)
+                else:
+                    rows[n] = v
+                if c.has_offset >= 0 and "has_" + n not in columns:
+                    set_bits(c.has_offset, c.has_bit, True)
+                continue
+            c = layout.get(n[4:]) if n.startswith("has_") else None
+            if c is None or not (c.optional or c.kind == "enum"):
+                raise KeyError("%s has no column %s" % (t._IN.__name__, n))
+            masks.append((n[4:], c, numpy.asarray(v, numpy.bool_)))
+        for n, c, m in masks:
+            if c.has_offset >= 0:
+                set_bits(c.has_offset, c.has_bit, m)
+            elif c.kind == "enum":
+                rows[n][~m] = 255
+            else:
+                rows[n][~m] = math.nan
+        return cls(writer, t, size, with_header, rows.tobytes())
+
+    def __getitem__(self, index: int) -> B:
+        return self._t(self._writer, offset=self._offset + 8 + index * self._t._SIZE)
+
+    def _copy(self, inp: ListIn) -> None:
+        assert self._size == inp._size
+        for i in range(self._size):
+            self[i]._copy(inp[i])
+
+    def _from_dict(self, values: Sequence[dict[str, Any]]) -> None:
+        for i, v in enumerate(values):
+            self[i]._from_dict(v)
+
+
+class TextListOut(OutList):
+    def __init__(self, writer: "Writer", size: int, with_header: bool = True) -> None:
+        """Private constructor. Use factory methods on writer"""
+        super().__init__(writer, b"\0\0\0\0\0\0" * size, size, with_header)
+
+    def __setitem__(self, index: int, value: TextOut | str) -> None:
+        """Add value to list at index"""
+        assert 0 <= index < self._size
+        if not isinstance(value, TextOut):
+            value = self._writer.construct_text(value)
+        pack48_into_(self._writer._data, self._offset + index * 6, value._offset - 10)
+
+    def _from_dict(self, values: Sequence[str | None]) -> None:
+        for i, v in enumerate(values):
+            if v is not None:
+                self[i] = v
+
+
+class BytesListOut(OutList):
+    def __init__(self, writer: "Writer", size: int, with_header: bool = True) -> None:
+        """Private constructor. Use factory methods on writer"""
+        super().__init__(writer, b"\0\0\0\0\0\0" * size, size, with_header)
+
+    def __setitem__(self, index: int, value: BytesOut | bytes) -> None:
+        """Add value to list at index"""
+        assert 0 <= index < self._size
+        if not isinstance(value, BytesOut):
+            value = self._writer.construct_bytes(value)
+        pack48_into_(self._writer._data, self._offset + index * 6, value._offset - 10)
+
+    def _from_dict(self, values: Sequence[bytes | None]) -> None:
+        for i, v in enumerate(values):
+            if v is not None:
+                self[i] = v
+
+
+class UnionListOut(OutList, Generic[UO]):
+    def __init__(
+        self, writer: "Writer", u: type[UO], size: int, with_header: bool = True
+    ) -> None:
+        """Private constructor. Use factory methods on writer"""
+        super().__init__(writer, b"\0\0\0\0\0\0\0\0" * size, size, with_header)
+        self._u = u
+
+    def __getitem__(self, index: int) -> B:
+        return self._u(self._writer, self._offset + index * 8)
+
+    def _copy(self, inp: ListIn) -> None:
+        assert self._size == inp._size
+        for i in range(self._size):
+            self[i]._copy(inp[i])
+
+    def _from_dict(self, values: Sequence[dict[str, Any]]) -> None:
+        for i, v in enumerate(values):
+            if v:
+                self[i]._from_dict(v)
+
+
+def _estimate_size(v: Any) -> int:
+    """Estimate the number of bytes needed to encode v with from_dict"""
+    if isinstance(v, dict):
+        return 16 + sum(map(_estimate_size, v.values()))
+    if isinstance(v, (str, bytes)):
+        return 17 + len(v)
+    if isinstance(v, (list, tuple)):
+        if v and isinstance(v[0], (dict, str, bytes, list, tuple)):
+            return 16 + sum(map(_estimate_size, v))
+        return 16 + 8 * len(v)
+    return getattr(v, "nbytes", 8)
+
+
+class WriterBacking(ABC):
+    """Storage for the message of a writer, by default an in memory bytearray"""
+
+    @abstractmethod
+    def set_capacity(self, capacity: int) -> bytearray | mmap.mmap:
+        """Resize the storage to hold at least capacity bytes, keeping its
+        content, and return a writable buffer over it"""
+
+    @abstractmethod
+    def finalize_backing(self, size: int) -> None:
+        """Called when a message of the given size has been finalized"""
+
+
+class FileWriterBacking(WriterBacking):
+    """Write the message directly to a memory mapped file, so messages larger
+    than memory can be produced. The file is truncated to the message size
+    when the message is finalized. Use Writer.finalize(root, copy=False) to
+    avoid reading the message back into memory, and release the view before
+    finalizing again"""
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "w+b")
+        self._file.truncate(mmap.PAGESIZE)
+        self._map = mmap.mmap(self._file.fileno(), mmap.PAGESIZE)
+
+    def set_capacity(self, capacity: int) -> mmap.mmap:
+        if self._map.closed:
+            raise ValueError("Cannot extend mmap backing after closing it")
+        # Round up to a whole number of pages. The file is resized even when
+        # the capacity is unchanged, since it may have been truncated by
+        # finalize_backing
+        capacity = -(-capacity // mmap.PAGESIZE) * mmap.PAGESIZE
+        self._map.resize(capacity)
+        return self._map
+
+    def finalize_backing(self, size: int) -> None:
+        if self._map.closed:
+            raise ValueError("Cannot truncate mmap backing after closing it")
+        self._map.flush()
+        # Shrink the map along with the file, so that the writer grows the file
+        # through set_capacity if it writes on after finalizing
+        self._map.resize(size)
+
+    def close(self) -> None:
+        """Unmap and close the file. Views of the message must be released first"""
+        self._map.close()
+        self._file.close()
+
+
+class Writer:
+    _data: bytearray | mmap.mmap = None
+    _used: int = 0
+    # The number of bytes removed by the last finalize with compact set
+    reclaimed: int = 0
+    _growth_factor: float = 2.0
+    _backing: WriterBacking | None = None
+
+    def _reserve(self, s: int):
+        need = self._used + s
+        capacity = len(self._data)
+        if need > capacity:
+            capacity = max(need, int(capacity * self._growth_factor))
+            if self._backing is not None:
+                self._data = self._backing.set_capacity(capacity)
+            else:
+                self._data.extend(bytes(capacity - len(self._data)))
+
+    def _write(self, v: bytes):
+        self._data[self._used : self._used + len(v)] = v
+        self._used += len(v)
+
+    def _put(self, offset: int, value: bytes):
+        self._data[offset : offset + len(value)] = value
+
+    def __init__(
+        self,
+        initial_capacity: int = 256,
+        growth_factor: float = 2.0,
+        backing: WriterBacking | None = None,
+    ):
+        """Construct a writer with room for initial_capacity bytes. When the
+        message outgrows the buffer it is extended in place by growth_factor,
+        so pass the expected message size to avoid growing. The message is
+        stored in backing if given, and in a bytearray otherwise"""
+        assert growth_factor > 1
+        if backing is not None:
+            self._data = backing.set_capacity(max(initial_capacity, 10))
+        else:
+            self._data = bytearray(max(initial_capacity, 10))
+        self._used = 10
+        self._growth_factor = growth_factor
+        self._backing = backing
+
+    def reset(self) -> None:
+        """Discard the message written so far, keeping the buffer for the next"""
+        self._used = 10
+        if self._backing is not None:
+            self._data = self._backing.set_capacity(len(self._data))
+
+    def construct_table(self, t: type[TO]) -> TO:
+        """Construct a table of the given type"""
+        return t(self, True)
+
+    def construct_int8_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "b", 1, size)
+
+    def construct_uint8_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "B", 1, size)
+
+    def construct_int16_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "h", 2, size)
+
+    def construct_uint16_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "H", 2, size)
+
+    def construct_int32_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "i", 4, size)
+
+    def construct_uint32_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "I", 4, size)
+
+    def construct_int64_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "q", 8, size)
+
+    def construct_uint64_list(self, size: int) -> BasicListOut[int]:
+        return BasicListOut[int](self, "Q", 8, size)
+
+    def construct_float32_list(self, size: int) -> BasicListOut[float]:
+        return BasicListOut[float](self, "f", 4, size)
+
+    def construct_float64_list(self, size: int) -> BasicListOut[float]:
+        return BasicListOut[float](self, "d", 8, size)
+
+    def construct_enum_list(self, e: type[E], size: int) -> EnumListOut[E]:
+        return EnumListOut[E](self, e, size)
+
+    def construct_struct_list(self, s: type[S], size: int) -> StructListOut[S]:
+        return StructListOut[S](self, s, size)
+
+    def construct_table_list(self, s: type[TO], size: int) -> TableListOut[TO]:
+        return TableListOut[S](self, s, size)
+
+    def construct_direct_table_list(
+        self, s: type[TO], size: int
+    ) -> DirectTableListOut[TO]:
+        return DirectTableListOut[S](self, s, size)
+
+    def construct_direct_table_list_from(
+        self, t: type[TO], values: Any
+    ) -> DirectTableListOut[TO]:
+        """Construct a direct table list from a numpy structured array, or a
+        mapping from member names to columns. The fields or keys name members
+        like in numpy_table_dtype(t), bools included, and are set as by the
+        setters of the tables. A has_ field or key followed by the name of an
+        optional member or enum is a mask of which tables have the member.
+        Requires numpy"""
+        return DirectTableListOut[TO]._from(self, t, values)
+
+    def construct_text_list(self, size: int) -> TextListOut:
+        return TextListOut(self, size)
+
+    def construct_bytes_list(self, size: int) -> BytesListOut:
+        return BytesListOut(self, size)
+
+    def construct_bool_list(self, size: int) -> BoolListOut:
+        return BoolListOut(self, size)
+
+    def construct_union_list(self, u: type[UO], size: int) -> UnionListOut[UO]:
+        return UnionListOut[UO](self, u, size)
+
+    # The construct_*_list_from methods below write the whole payload of a list
+    # of basic, bool, enum or struct values in one step. values may be any
+    # iterable or a numpy array, which is converted to the stored type.
+
+    def construct_int8_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "b", 1, values)
+
+    def construct_uint8_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "B", 1, values)
+
+    def construct_int16_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "h", 2, values)
+
+    def construct_uint16_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "H", 2, values)
+
+    def construct_int32_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "i", 4, values)
+
+    def construct_uint32_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "I", 4, values)
+
+    def construct_int64_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "q", 8, values)
+
+    def construct_uint64_list_from(self, values: Any) -> BasicListOut[int]:
+        return BasicListOut[int]._from(self, "Q", 8, values)
+
+    def construct_float32_list_from(self, values: Any) -> BasicListOut[float]:
+        return BasicListOut[float]._from(self, "f", 4, values)
+
+    def construct_float64_list_from(self, values: Any) -> BasicListOut[float]:
+        return BasicListOut[float]._from(self, "d", 8, values)
+
+    def construct_bool_list_from(self, values: Any) -> BoolListOut:
+        return BoolListOut._from(self, values)
+
+    def construct_enum_list_from(self, e: type[E], values: Any) -> EnumListOut[E]:
+        return EnumListOut[E]._from(self, e, values)
+
+    def construct_struct_list_from(self, s: type[S], values: Any) -> StructListOut[S]:
+        return StructListOut[S]._from(self, s, values)
+
+    def construct_bytes(self, b: bytes) -> BytesOut:
+        self._reserve(len(b) + 10)
+        sizelow, sizehigh = split48_(len(b))
+        self._write(_HEADER.pack(BYTES_MAGIC, sizelow, sizehigh))
+        o = self._used
+        self._write(b)
+        return BytesOut(o)
+
+    def construct_text(self, t: str) -> TextOut:
+        tt = t.encode("utf-8")
+        self._reserve(len(tt) + 11)
+        sizelow, sizehigh = split48_(len(tt))
+        self._write(_HEADER.pack(TEXT_MAGIC, sizelow, sizehigh))
+        o = self._used
+        self._write(tt)
+        self._write(b"\0")
+        return TextOut(o)
+
+    def copy(self, t: type[TO], i: TI) -> TO:
+        res = t(self, True)
+        res._copy(i)
+        return res
+
+    def embed(self, t: type[TO], i: TI) -> TO:
+        """Copy the table i, read from another message, and the objects
+        reachable from it, like copy.
+
+        If those objects lie next to each other in the message of i, with
+        nothing else between them, their bytes are copied at once and only the
+        offsets in them are moved. Otherwise, or if i is not a table of type t
+        with its own header, the objects are copied member by member"""
+        reader = i._reader
+        data = _view(reader._data)
+        start = i._offset - 10
+        if t._IN is type(i) and i._size == t._SIZE and start >= 10:
+            reader._fill(start, 10)
+            magic, sizelow, sizehigh = _HEADER.unpack_from(data, start)
+            if magic == t._MAGIC and join48_(sizelow, sizehigh) == t._SIZE:
+                # Checking the header above rules out tables in direct lists and
+                # inplace tables
+                walker = _Walker(data, reader._fill)
+                walker.pointer(Pointer(0, "table", t._IN, False, False), start)
+                walker.spans.sort()
+                lo, end = walker.spans[0]
+                for s, e in walker.spans:
+                    if s > end:
+                        break
+                    end = max(end, e)
+                else:
+                    if walker.complete:
+                        reader._fill(lo, end - lo)
+                        delta = self._used - lo
+                        self._reserve(end - lo)
+                        self._write(data[lo:end])
+                        out = self._data
+                        for slot in walker.slots:
+                            v = unpack48_from_(data, slot) + delta
+                            pack48_into_(out, slot + delta, v)
+                        return t(self, offset=i._offset + delta)
+        return self.copy(t, i)
+
+    def splice(self, t: type[TO], other: "Writer | Buffer") -> TO:
+        """Append the finalized message other, or the message of the finalized
+        writer other, with a root table of type t, and return its root table.
+
+        The offsets in the message are moved to its new position by following
+        its objects using the schema of t, so other must be written with the
+        same schema. This allows parts of a message to be constructed by
+        separate writers, for instance in other processes"""
+        if isinstance(other, Writer):
+            if other is self:
+                raise ValueError("Cannot splice a writer into itself")
+            other = memoryview(other._data)[: other._used]
+        data = _view(other)
+        magic, offsetlow, offsethigh = _HEADER.unpack_from(data, 0)
+        if magic != MESSAGE_MAGIC:
+            raise Exception("Expected magic %08X but got %08X" % (MESSAGE_MAGIC, magic))
+        root = join48_(offsetlow, offsethigh)
+        walker = _Walker(data)
+        walker.pointer(Pointer(0, "table", t._IN, False, False), root)
+        if not walker.complete:
+            raise Exception(
+                "Cannot splice a message with members unknown to the schema"
+            )
+        delta = self._used - 10
+        self._reserve(len(data) - 10)
+        self._write(data[10:])
+        out = self._data
+        for slot in walker.slots:
+            pack48_into_(out, slot + delta, unpack48_from_(data, slot) + delta)
+        return t(self, offset=root + 10 + delta)
+
+    def encode(
+        self, t: type[TO], d: dict[str, Any], copy: bool = True
+    ) -> bytes | memoryview:
+        """Return the finalized message with a root table of type t constructed
+        from d, see TableOut.from_dict. Room for the whole message is reserved
+        up front from an estimate of its size"""
+        self._reserve(_estimate_size(d))
+        return self.finalize(t.from_dict(self, d), copy)
+
+    def finalize(
+        self, root: TableOut, copy: bool = True, compact: bool = False
+    ) -> bytes | memoryview:
+        """Return finalized message given root object.
+
+        If copy is False a memoryview of the writer's buffer is returned instead
+        of a copy. It is overwritten by writes after a reset, and the writer
+        cannot grow until the view is released.
+
+        If compact is True objects that can not be reached from root, such as
+        earlier values of members set more than once, are removed from the
+        message, see scalgoproto.compact, and the number of bytes removed is
+        stored in reclaimed. This moves the objects constructed so far, so the
+        writer must be reset before constructing more"""
+        offsetlow, offsethigh = split48_(root._offset - 10)
+        _HEADER.pack_into(self._data, 0, MESSAGE_MAGIC, offsetlow, offsethigh)
+        self.reclaimed = 0
+        if compact:
+            data = _compact(_view(self._data)[: self._used], type(root)._IN)
+            self.reclaimed = self._used - len(data)
+            self._data[: len(data)] = data
+            self._used = len(data)
+        if self._backing is not None:
+            self._backing.finalize_backing(self._used)
+        if not copy:
+            return memoryview(self._data)[0 : self._used]
+        return self._data[0 : self._used]
+
+
+def _scan_frames(data: mmap.mmap, offset: int, end: int) -> list[int]:
+    """Return the offsets of the frames between offset and end of a message file
+    without a valid index. Damaged frames are skipped by searching for the next
+    message magic preceded by a size that fits in the file"""
+    magic = _UINT32.pack(MESSAGE_MAGIC)
+    frames = []
+    while offset + 18 <= end:
+        (size,) = _UINT64.unpack_from(data, offset)
+        if size >= 10 and offset + 8 + size <= end:
+            if data[offset + 8 : offset + 12] == magic:
+                frames.append(offset)
+                offset += 8 + size
+                continue
+        p = data.find(magic, offset + 9, end)
+        if p < 0:
+            break
+        offset = p - 8
+    return frames
+
+
+class MessageFileReader:
+    """Read a file of many messages written by MessageFileWriter.
+
+    The file is memory mapped, and reader[i] returns a Reader for message i
+    in constant time using the index at the end of the file. If the index is
+    missing or damaged, for instance because the writer was not closed, the
+    messages are found by scanning the frames instead"""
+
+    def __init__(self, path: str, zero_copy: bool = False) -> None:
+        """zero_copy is passed on to the readers of the messages"""
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._zero_copy = zero_copy
+        size = len(self._map)
+        if size < 8 or _FILE_HEADER.unpack_from(self._map)[0] != MESSAGE_FILE_MAGIC:
+            self.close()
+            raise Exception("Invalid message file")
+        # The offset of the index, or -1 if the frames were scanned into _frames
+        self._index = -1
+        self._frames: list[int] = []
+        self._count = 0
+        end = size - _FILE_TRAILER.size
+        if end >= 8:
+            index, count, magic = _FILE_TRAILER.unpack_from(self._map, end)
+            if magic == MESSAGE_INDEX_MAGIC and 8 <= index == end - count * 8:
+                self._index = index
+                self._count = count
+        if self._index < 0:
+            self._frames = _scan_frames(self._map, 8, size)
+            self._count = len(self._frames)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> Reader:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError()
+        if self._index < 0:
+            o = self._frames[i]
+        else:
+            (o,) = _UINT64.unpack_from(self._map, self._index + i * 8)
+        (size,) = _UINT64.unpack_from(self._map, o)
+        return Reader(memoryview(self._map)[o + 8 : o + 8 + size], self._zero_copy)
+
+    def __iter__(self) -> Iterator[Reader]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self) -> None:
+        """Unmap and close the file. Readers of the messages must be released
+        first"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "MessageFileReader":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class MessageFileWriter:
+    """Write many messages to one file.
+
+    Each message is stored as a frame of its size as a U64 followed by the
+    message. When the writer is closed an index of the frame offsets is
+    appended, giving MessageFileReader random access to the messages"""
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        """If append is True and path exists, messages are added after the ones
+        already in the file, without rewriting them. Only the index is
+        rewritten. Damaged frames at the end of the file are discarded"""
+        self._index = array.array("Q")
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with MessageFileReader(path) as r:
+                if r._index < 0:
+                    self._index.extend(r._frames)
+                else:
+                    self._index.frombytes(r._map[r._index : r._index + r._count * 8])
+                    if sys.byteorder != "little":
+                        self._index.byteswap()
+                end = 8
+                if r._count:
+                    o = self._index[-1]
+                    end = o + 8 + _UINT64.unpack_from(r._map, o)[0]
+            self._file = open(path, "r+b")
+            self._file.truncate(end)
+            self._file.seek(end)
+            self._end = end
+        else:
+            self._file = open(path, "wb")
+            self._file.write(_FILE_HEADER.pack(MESSAGE_FILE_MAGIC, 1))
+            self._end = 8
+
+    def write(self, message: Buffer) -> int:
+        """Append a finalized message, and return its index in the file"""
+        m = _UINT32.unpack_from(message, 0)[0] if len(message) >= 10 else 0
+        if m != MESSAGE_MAGIC:
+            raise Exception("Expected magic %08X but got %08X" % (MESSAGE_MAGIC, m))
+        self._file.write(_UINT64.pack(len(message)))
+        self._file.write(message)
+        self._index.append(self._end)
+        self._end += 8 + len(message)
+        return len(self._index) - 1
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        """Write the index and close the file"""
+        index = array.array("Q", self._index)
+        if sys.byteorder != "little":
+            index.byteswap()
+        self._file.write(index.tobytes())
+        self._file.write(
+            _FILE_TRAILER.pack(self._end, len(self._index), MESSAGE_INDEX_MAGIC)
+        )
+        self._file.close()
+
+    def __enter__(self) -> "MessageFileWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+# The codecs compressed messages may use, and the name of their compression
+# level argument. The codec stored in the header is its position here plus one
+_BLOCK_CODECS = {"zlib": "level", "lzma": "preset", "bz2": "compresslevel"}
+
+
+def compress_message(
+    message: Buffer, codec: str = "zlib", block_size: int = 1 << 16, level: int = -1
+) -> bytes:
+    """Return a finalized message compressed for reading with CompressedReader.
+
+    The message is split into blocks of block_size bytes, which are compressed
+    independently with codec, one of "zlib", "lzma" and "bz2". A header and an
+    index of the compressed blocks come first, so that any block can be found
+    and decompressed on its own. level is passed on to the codec, -1 meaning
+    its default"""
+    if codec not in _BLOCK_CODECS:
+        raise ValueError("Unknown codec %s" % codec)
+    if block_size <= 0:
+        raise ValueError("block_size must be positive")
+    m = _UINT32.unpack_from(message, 0)[0] if len(message) >= 10 else 0
+    if m != MESSAGE_MAGIC:
+        raise Exception("Expected magic %08X but got %08X" % (MESSAGE_MAGIC, m))
+    compress = importlib.import_module(codec).compress
+    kwds = {} if level == -1 else {_BLOCK_CODECS[codec]: level}
+    data = _view(message)
+    blocks = [
+        compress(data[o : o + block_size], **kwds)
+        for o in range(0, len(data), block_size)
+    ]
+    index = array.array("Q")
+    o = _COMPRESSED_HEADER.size + 8 * (len(blocks) + 1)
+    for b in blocks:
+        index.append(o)
+        o += len(b)
+    index.append(o)
+    if sys.byteorder != "little":
+        index.byteswap()
+    header = _COMPRESSED_HEADER.pack(
+        COMPRESSED_MAGIC,
+        1,
+        list(_BLOCK_CODECS).index(codec) + 1,
+        block_size,
+        len(data),
+        len(blocks),
+    )
+    return b"".join([header, index.tobytes()] + blocks)
+
+
+# Releasing pages of a private memory map frees them. Without it blocks of a
+# CompressedReader are never released
+_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+
+class _Block:
+    """Keeps a decompressed block of a CompressedReader present while referenced"""
+
+    __slots__ = ["__weakref__"]
+
+
+def _release_block(
+    data: mmap.mmap, loaded: bytearray, block: int, start: int, end: int
+) -> None:
+    """Free the whole pages of the block from start to end of data, which are
+    decompressed again when next needed"""
+    start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if _DONTNEED is not None and start < end:
+        loaded[block] = 0
+        data.madvise(_DONTNEED, start, end - start)
+
+
+class CompressedReader(Reader):
+    """Read a message compressed with compress_message without decompressing it
+    up front.
+
+    The message is read from an anonymous memory map of its uncompressed size,
+    into which each block is decompressed when an object in it is accessed.
+    Pages of blocks never accessed are not backed by memory. The max_blocks
+    most recently used blocks are kept, along with the blocks of the tables
+    and the views of bytes and numpy arrays still alive. Other blocks are
+    released, and decompressed again if accessed later. Lists only keep the
+    block of the elements being read"""
+
+    _pinning = True
+
+    def __init__(
+        self, data: Buffer, zero_copy: bool = False, max_blocks: int = 64
+    ) -> None:
+        """data is the compressed message, such as the contents of a file or an
+        mmap.mmap of it. It must be kept alive while the reader is in use"""
+        import ctypes
+
+        h = _COMPRESSED_HEADER
+        if len(data) < h.size or _UINT32.unpack_from(data, 0)[0] != COMPRESSED_MAGIC:
+            raise Exception("Invalid compressed message")
+        _, version, codec, block_size, size, count = h.unpack_from(data, 0)
+        if (
+            version != 1
+            or not 0 < codec <= len(_BLOCK_CODECS)
+            or block_size == 0
+            or count != (size + block_size - 1) // block_size
+            or len(data) < h.size + 8 * (count + 1)
+            or size < 10
+        ):
+            raise Exception("Invalid compressed message")
+        if max_blocks <= 0:
+            raise ValueError("max_blocks must be positive")
+        self._compressed = data
+        name = list(_BLOCK_CODECS)[codec - 1]
+        self._decompress = importlib.import_module(name).decompress
+        self._block_size = block_size
+        self._max_blocks = max_blocks
+        # Whether the data of each block is present
+        self._loaded = bytearray(count)
+        # The blocks in use, and the most recently used in order of use
+        self._blocks: weakref.WeakValueDictionary[int, _Block] = (
+            weakref.WeakValueDictionary()
+        )
+        self._cache: collections.OrderedDict[int, _Block] = collections.OrderedDict()
+        # The blocks of the most recent _fill
+        self._last: tuple[_Block, ...] = ()
+        if _DONTNEED is not None:
+            self._map = mmap.mmap(-1, size, flags=mmap.MAP_PRIVATE)
+        else:
+            self._map = mmap.mmap(-1, size)
+        # Exported views of the message are made through this array type, which
+        # can hold on to the blocks of the view
+        self._array = ctypes.c_ubyte * size
+        super().__init__(self._map, zero_copy)
+
+    def _load(self, block: int) -> _Block:
+        offset = block * self._block_size
+        end = min(offset + self._block_size, len(self._data))
+        if not self._loaded[block]:
+            start, stop = struct.unpack_from(
+                "<QQ", self._compressed, _COMPRESSED_HEADER.size + 8 * block
+            )
+            data = self._decompress(self._compressed[start:stop])
+            if len(data) != end - offset:
+                raise Exception("Invalid compressed message")
+            self._data[offset:end] = data
+            self._loaded[block] = 1
+        pin = self._blocks[block] = _Block()
+        release = weakref.finalize(
+            pin, _release_block, self._map, self._loaded, block, offset, end
+        )
+        release.atexit = False
+        return pin
+
+    def _fill(self, offset: int, size: int) -> tuple[_Block, ...]:
+        if size <= 0:
+            return ()
+        cache = self._cache
+        pins = []
+        last = min((offset + size - 1) // self._block_size, len(self._loaded) - 1)
+        for block in range(offset // self._block_size, last + 1):
+            pin = cache.get(block)
+            if pin is not None:
+                cache.move_to_end(block)
+            else:
+                pin = cache[block] = self._blocks.get(block) or self._load(block)
+            pins.append(pin)
+        self._last = tuple(pins)
+        while len(cache) > self._max_blocks:
+            cache.popitem(last=False)
+        return self._last
+
+    def _export(self, offset: int, size: int) -> Buffer:
+        view = self._array.from_buffer(self._map)
+        view.pin = self._fill(offset, size)
+        return view
+
+    def _paged(self, res: ListIn[B]) -> ListIn[B]:
+        """Make the list fill the blocks of its elements as they are read,
+        instead of keeping all of them"""
+        getter, haser, iterator = res._getter, res._haser, res._iterator
+        bits = 1 if res._dtype is bool else res._width * 8
+        per_block = max(self._block_size * 8 // bits, 8) if bits else 1 << 62
+
+        def span(s: int, i: int, n: int) -> tuple[int, int]:
+            lo = s + (i * bits >> 3)
+            return lo, s + ((i + n) * bits + 7 >> 3) - lo
+
+        def get(r: "CompressedReader", s: int, i: int) -> B:
+            r._fill(*span(s, i, 1))
+            return getter(r, s, i)
+
+        def has(r: "CompressedReader", s: int, i: int) -> bool:
+            r._fill(*span(s, i, 1))
+            return haser(r, s, i)
+
+        def iterate(r: "CompressedReader", s: int, n: int) -> Iterator[B]:
+            for i in range(0, n, per_block):
+                m = min(per_block, n - i)
+                lo, nbytes = span(s, i, m)
+                # Reading the elements may fill other blocks, so hold on to
+                # their own until they have all been read
+                pin = r._fill(lo, nbytes)
+                chunk = list(iterator(r, lo, m))
+                del pin
+                yield from chunk
+                if len(chunk) < m:
+                    # Iteration of enum lists ends at the first missing element
+                    return
+
+        res._getter, res._haser = get, has
+        if iterator is not None:
+            res._iterator = iterate
+        return res
+
+    def verify(
+        self, root_type: type[TI], max_depth: int = 64, max_objects: int = 1 << 24
+    ) -> None:
+        self._fill(0, len(self._data))
+        super().verify(root_type, max_depth, max_objects)
+
+    def _read_size(self, offset: int, magic: int):
+        self._fill(offset, 10)
+        size = super()._read_size(offset, magic)
+        if magic != LIST_MAGIC and magic != DIRECT_LIST_MAGIC:
+            self._fill(offset + 10, size)
+        # The elements of lists are filled as they are read
+        return size
+
+    def _get_text(self, offset: int, size: int) -> str:
+        self._fill(offset, size)
+        return super()._get_text(offset, size)
+
+    def _get_bytes(self, offset: int, size: int) -> bytes | memoryview:
+        if self._zero_copy:
+            return _view(self._export(offset, size))[offset : offset + size]
+        self._fill(offset, size)
+        return super()._get_bytes(offset, size)
+
+    def _get_table_list(
+        self, t: type[TI], off: int, size: int, direct: bool = False
+    ) -> ListIn[TI]:
+        if direct:
+            self._fill(off, 8)
+        return self._paged(super()._get_table_list(t, off, size, direct))
+
+    def _get_union_list(self, t: type[UI], off: int, size: int) -> ListIn[UI]:
+        return self._paged(super()._get_union_list(t, off, size))
+
+    def _get_bool_list(self, off: int, size: int) -> ListIn[bool]:
+        return self._paged(super()._get_bool_list(off, size))
+
+    def _get_int_list(self, f: str, w: int, off: int, size: int) -> ListIn[int]:
+        return self._paged(super()._get_int_list(f, w, off, size))
+
+    def _get_float_list(self, f: str, w: int, off: int, size: int) -> ListIn[float]:
+        return self._paged(super()._get_float_list(f, w, off, size))
+
+    def _get_struct_list(self, t: type[S], off: int, size: int) -> ListIn[S]:
+        return self._paged(super()._get_struct_list(t, off, size))
+
+    def _get_enum_list(self, t: type[E], off: int, size: int) -> ListIn[E]:
+        return self._paged(super()._get_enum_list(t, off, size))
+
+    def _get_text_list(self, off: int, size: int) -> ListIn[str]:
+        return self._paged(super()._get_text_list(off, size))
+
+    def _get_bytes_list(self, off: int, size: int) -> ListIn[bytes | memoryview]:
+        return self._paged(super()._get_bytes_list(off, size))
+
+    def root(self, type: type[TI]) -> TI:
+        self._fill(0, 10)
+        return super().root(type)
+
+
+# The shared and mapped readers of this process by their type and the name of
+# their segment or file, so that objects unpickled from the same message share
+# one reader
+_ATTACHED_READERS: "weakref.WeakValueDictionary[tuple[type, str], Reader]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _attach(
+    t: "type[SharedReader] | type[MappedReader]",
+    key: str,
+    zero_copy: bool,
+    verified: type[TableIn] | None,
+) -> Reader:
+    r = _ATTACHED_READERS.get((t, key))
+    if r is None or r._zero_copy != zero_copy:
+        r = t.attach(key, zero_copy)
+    if verified is not None and not r._trusted:
+        r._trusted = True
+        r._verified = verified
+    return r
+
+
+class SharedReader(Reader):
+    """Read a message stored in a multiprocessing.shared_memory segment.
+
+    Pickling the reader, or tables, unions and lists read from it, only stores
+    the name of the segment and the position of the object. When unpickled in
+    another process, such as a worker of a ProcessPoolExecutor, the segment is
+    attached instead of copying the message. A process attaches each segment
+    once while objects read from it are alive.
+
+    The process that created the segment must unlink it when it is no longer
+    needed, by calling unlink or using the reader as a context manager. Only
+    processes started by multiprocessing should attach the segment, as the
+    segment is otherwise removed when the first of them exits"""
+
+    def __init__(self, data: Buffer, zero_copy: bool = False) -> None:
+        """Copy the message data into a new shared memory segment"""
+        from multiprocessing import shared_memory
+
+        size = len(_view(data))
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self._shm.buf[:size] = data
+        self._owner = True
+        self._init(zero_copy)
+
+    @classmethod
+    def attach(cls, name: str, zero_copy: bool = False) -> "SharedReader":
+        """Return a reader of the message in the existing segment name"""
+        from multiprocessing import shared_memory
+
+        self = cls.__new__(cls)
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = False
+        self._init(zero_copy)
+        return self
+
+    def _init(self, zero_copy: bool) -> None:
+        super().__init__(b"", zero_copy)
+        # The buffer is used as is, since views of it would keep the segment
+        # from being closed. It may be rounded up to a whole number of pages
+        self._data = self._shm.buf
+        _ATTACHED_READERS[(SharedReader, self._shm.name)] = self
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory segment"""
+        return self._shm.name
+
+    def __reduce__(self) -> tuple:
+        return (
+            _attach,
+            (SharedReader, self._shm.name, self._zero_copy, self._verified),
+        )
+
+    def close(self) -> None:
+        """Detach the segment. Objects read from the reader must be released
+        first"""
+        self._data = b""
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Detach and remove the segment. Processes that have attached it can
+        still use it until they detach it"""
+        self.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedReader":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
+
+class MappedReader(Reader):
+    """Read a message from a memory mapped file.
+
+    Like SharedReader, pickling the reader, or objects read from it, only
+    stores the path of the file, which is mapped again by the process
+    unpickling it. The file must not be changed while it is in use"""
+
+    def __init__(self, path: str, zero_copy: bool = False) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(self._map, zero_copy)
+        self._path = os.path.abspath(path)
+        _ATTACHED_READERS[(MappedReader, self._path)] = self
+
+    @classmethod
+    def attach(cls, path: str, zero_copy: bool = False) -> "MappedReader":
+        return cls(path, zero_copy)
+
+    def __reduce__(self) -> tuple:
+        return (
+            _attach,
+            (MappedReader, self._path, self._zero_copy, self._verified),
+        )
+
+    def close(self) -> None:
+        """Unmap the file. Objects read from the reader must be released first"""
+        self._data = b""
+        self._map.close()
+
+    def __enter__(self) -> "MappedReader":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
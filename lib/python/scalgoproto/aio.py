@@ -0,0 +1,355 @@
+"""Send and receive messages over asyncio transports such as sockets and pipes.
+
+Each message is sent as a frame of its size as a U64 followed by the message.
+Received data is read by the transport directly into reusable buffers taken
+from a BufferPool, and handed to Reader without copying. A buffer is returned
+to the pool when the Reader of its message has been released, and is reused
+once no object read from it, such as a zero_copy bytes value, is alive."""
+
+import asyncio
+import collections
+import weakref
+from typing import Any
+from collections.abc import Awaitable, Callable
+
+from . import _UINT64, Reader, TableOut, Writer
+
+# Size of the buffer frames are received into. Messages larger than half of it
+# are received directly into their own buffer
+_RECEIVE_SIZE = 1 << 16
+
+# The default limit on the size of received messages
+_MAX_MESSAGE_SIZE = 1 << 30
+
+
+class BufferPool:
+    """Reusable bytearrays, kept in power of two sizes"""
+
+    def __init__(self, max_free: int = 64) -> None:
+        """At most max_free buffers of each size are kept for reuse"""
+        self._max_free = max_free
+        self._free: dict[int, list[bytearray]] = {}
+
+    def acquire(self, size: int) -> bytearray:
+        """Return a buffer of at least size bytes"""
+        capacity = max(256, 1 << (size - 1).bit_length())
+        free = self._free.get(capacity)
+        while free:
+            buffer = free.pop()
+            # Resizing fails while views of the buffer are alive. Such buffers
+            # are dropped, and freed once the views are released
+            try:
+                last = buffer.pop()
+            except BufferError:
+                continue
+            buffer.append(last)
+            return buffer
+        return bytearray(capacity)
+
+    def release(self, buffer: bytearray) -> None:
+        """Return buffer to the pool. It is only reused once there are no views
+        of it left"""
+        free = self._free.setdefault(len(buffer), [])
+        if len(free) < self._max_free:
+            free.append(buffer)
+
+
+_POOL = BufferPool()
+
+
+class MessageStream(asyncio.BufferedProtocol):
+    """Protocol sending and receiving framed messages. Use read_message and
+    write_message to transfer messages, and the open_* and start_* functions
+    of this module, or loop.create_connection and friends, to construct it"""
+
+    def __init__(
+        self,
+        pool: BufferPool | None = None,
+        zero_copy: bool = False,
+        max_queued: int = 64,
+        max_message_size: int = _MAX_MESSAGE_SIZE,
+    ) -> None:
+        """Received messages are stored in buffers from pool, by default one
+        shared by all streams. zero_copy is passed on to the readers of the
+        messages. Reading from the transport is paused while max_queued
+        messages are waiting to be read. A frame of more than max_message_size
+        bytes fails the stream and closes the connection"""
+        self._pool = pool if pool is not None else _POOL
+        self._zero_copy = zero_copy
+        self._max_queued = max_queued
+        self._max_message_size = max_message_size
+        self._transport: asyncio.BaseTransport | None = None
+        # Received data not yet split into frames is _buffer[_start:_end]
+        self._buffer = bytearray(_RECEIVE_SIZE)
+        self._start = 0
+        self._end = 0
+        # A large message being received directly into its own buffer
+        self._message: bytearray | None = None
+        self._size = 0
+        self._filled = 0
+        self._messages: collections.deque[Reader] = collections.deque()
+        self._read_paused = False
+        self._write_paused = False
+        self._eof = False
+        self._exception: BaseException | None = None
+        self._read_waiter: asyncio.Future[None] | None = None
+        self._write_waiter: asyncio.Future[None] | None = None
+        self._on_connect: Callable[["MessageStream"], Awaitable[Any]] | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+        if isinstance(transport, asyncio.WriteTransport):
+            # Pause writing as soon as data is buffered, so that write_message
+            # returns only once the transport no longer refers to the message
+            transport.set_write_buffer_limits(high=0, low=0)
+        if self._on_connect is not None:
+            asyncio.get_running_loop().create_task(self._on_connect(self))
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._message is not None:
+            return memoryview(self._message)[self._filled : self._size]
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif len(self._buffer) - self._end < _RECEIVE_SIZE // 2:
+            # Move the partial frame to the front. Frames kept in the buffer
+            # are at most half its size, so the rest of the frame now fits
+            n = self._end - self._start
+            self._buffer[:n] = self._buffer[self._start : self._end]
+            self._start, self._end = 0, n
+        return memoryview(self._buffer)[self._end :]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if self._exception is not None:
+            return
+        if self._message is not None:
+            self._filled += nbytes
+            if self._filled == self._size:
+                self._deliver(self._message, self._size)
+                self._message = None
+            return
+        self._end += nbytes
+        buffer = self._buffer
+        while self._end - self._start >= 8:
+            (size,) = _UINT64.unpack_from(buffer, self._start)
+            if size > self._max_message_size:
+                self._fail(
+                    Exception(
+                        "Message of %d bytes exceeds max_message_size %d"
+                        % (size, self._max_message_size)
+                    )
+                )
+                break
+            start = self._start + 8
+            available = self._end - start
+            if size <= available:
+                m = self._pool.acquire(size)
+                m[:size] = memoryview(buffer)[start : start + size]
+                self._start = start + size
+                self._deliver(m, size)
+            elif size > _RECEIVE_SIZE // 2:
+                m = self._pool.acquire(size)
+                m[:available] = memoryview(buffer)[start : self._end]
+                self._message, self._size, self._filled = m, size, available
+                self._start = self._end = 0
+                break
+            else:
+                break
+
+    def _deliver(self, m: bytearray, size: int) -> None:
+        r = Reader(memoryview(m)[:size], self._zero_copy)
+        weakref.finalize(r, self._pool.release, m)
+        self._messages.append(r)
+        if len(self._messages) >= self._max_queued and not self._read_paused:
+            assert isinstance(self._transport, asyncio.ReadTransport)
+            self._transport.pause_reading()
+            self._read_paused = True
+        self._wake_reader()
+
+    def _fail(self, exc: BaseException) -> None:
+        """Fail the stream with exc, dropping the data not yet received"""
+        self._exception = exc
+        self._start = self._end = 0
+        self._message = None
+        self.close()
+        self._wake_reader()
+
+    def _wake_reader(self) -> None:
+        if self._read_waiter is not None and not self._read_waiter.done():
+            self._read_waiter.set_result(None)
+
+    def _wake_writer(self) -> None:
+        if self._write_waiter is not None and not self._write_waiter.done():
+            self._write_waiter.set_result(None)
+
+    def eof_received(self) -> bool:
+        self._eof = True
+        self._wake_reader()
+        return False
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._eof = True
+        if exc is not None:
+            self._exception = exc
+        self._write_paused = False
+        self._wake_reader()
+        self._wake_writer()
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        self._wake_writer()
+
+    def close(self) -> None:
+        """Close the transport"""
+        if self._transport is not None:
+            self._transport.close()
+
+
+async def read_message(stream: MessageStream) -> Reader | None:
+    """Return a Reader for the next message received on stream, or None if the
+    connection was closed"""
+    while not stream._messages:
+        if stream._exception is not None:
+            raise stream._exception
+        if stream._eof:
+            if stream._message is not None or stream._end != stream._start:
+                raise Exception("Connection closed in the middle of a message")
+            return None
+        if stream._read_waiter is not None:
+            raise RuntimeError(
+                "read_message called while another task is waiting for a message"
+            )
+        stream._read_waiter = asyncio.get_running_loop().create_future()
+        try:
+            await stream._read_waiter
+        finally:
+            stream._read_waiter = None
+    r = stream._messages.popleft()
+    if stream._read_paused and len(stream._messages) <= stream._max_queued // 2:
+        assert isinstance(stream._transport, asyncio.ReadTransport)
+        stream._transport.resume_reading()
+        stream._read_paused = False
+    return r
+
+
+async def write_message(stream: MessageStream, writer: Writer, root: TableOut) -> None:
+    """Finalize the message of writer with the given root and send it on stream.
+
+    The message is handed to the transport without copying it, so writer may
+    only be reset once this returns. If this is cancelled before the transport
+    is done with the message, the connection is aborted, dropping the message,
+    as the stream can not continue from part of one"""
+    if stream._exception is not None:
+        raise stream._exception
+    if stream._write_waiter is not None:
+        raise RuntimeError(
+            "write_message called while another task is waiting to write"
+        )
+    transport = stream._transport
+    if transport is None or transport.is_closing():
+        raise ConnectionResetError("Connection closed")
+    assert isinstance(transport, asyncio.WriteTransport)
+    data = writer.finalize(root, copy=False)
+    try:
+        transport.write(_UINT64.pack(len(data)))
+        transport.write(data)
+        while stream._write_paused:
+            stream._write_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await stream._write_waiter
+            finally:
+                stream._write_waiter = None
+    except asyncio.CancelledError:
+        # Abort drops the references of the transport to the message
+        transport.abort()
+        raise
+    finally:
+        data.release()
+    if stream._exception is not None:
+        raise stream._exception
+
+
+def _factory(
+    pool: BufferPool | None,
+    zero_copy: bool,
+    max_message_size: int,
+    callback: Callable[[MessageStream], Awaitable[Any]] | None = None,
+) -> Callable[[], MessageStream]:
+    def factory() -> MessageStream:
+        stream = MessageStream(pool, zero_copy, max_message_size=max_message_size)
+        stream._on_connect = callback
+        return stream
+
+    return factory
+
+
+async def open_connection(
+    host: str | None = None,
+    port: int | None = None,
+    *,
+    pool: BufferPool | None = None,
+    zero_copy: bool = False,
+    max_message_size: int = _MAX_MESSAGE_SIZE,
+    **kwds: Any,
+) -> MessageStream:
+    """Connect to host and port like asyncio.open_connection"""
+    loop = asyncio.get_running_loop()
+    _, stream = await loop.create_connection(
+        _factory(pool, zero_copy, max_message_size), host, port, **kwds
+    )
+    return stream
+
+
+async def open_unix_connection(
+    path: str | None = None,
+    *,
+    pool: BufferPool | None = None,
+    zero_copy: bool = False,
+    max_message_size: int = _MAX_MESSAGE_SIZE,
+    **kwds: Any,
+) -> MessageStream:
+    """Connect to the unix socket at path like asyncio.open_unix_connection"""
+    loop = asyncio.get_running_loop()
+    _, stream = await loop.create_unix_connection(
+        _factory(pool, zero_copy, max_message_size), path, **kwds
+    )
+    return stream
+
+
+async def start_server(
+    client_connected_cb: Callable[[MessageStream], Awaitable[Any]],
+    host: str | None = None,
+    port: int | None = None,
+    *,
+    pool: BufferPool | None = None,
+    zero_copy: bool = False,
+    max_message_size: int = _MAX_MESSAGE_SIZE,
+    **kwds: Any,
+) -> asyncio.Server:
+    """Start a server like asyncio.start_server. client_connected_cb is called
+    with the stream of each new connection"""
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(
+        _factory(pool, zero_copy, max_message_size, client_connected_cb),
+        host,
+        port,
+        **kwds,
+    )
+
+
+async def start_unix_server(
+    client_connected_cb: Callable[[MessageStream], Awaitable[Any]],
+    path: str | None = None,
+    *,
+    pool: BufferPool | None = None,
+    zero_copy: bool = False,
+    max_message_size: int = _MAX_MESSAGE_SIZE,
+    **kwds: Any,
+) -> asyncio.Server:
+    """Start a server on the unix socket at path like asyncio.start_unix_server"""
+    loop = asyncio.get_running_loop()
+    return await loop.create_unix_server(
+        _factory(pool, zero_copy, max_message_size, client_connected_cb), path, **kwds
+    )
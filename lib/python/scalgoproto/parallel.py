@@ -0,0 +1,85 @@
+"""Process the elements of large lists in a pool of worker processes.
+
+The workers read the lists from the same message as the calling process,
+through a MappedReader of the file or a SharedReader of a shared memory
+segment, so only the positions of the elements are sent to them."""
+
+import collections
+import concurrent.futures
+import os
+from typing import Any, TypeVar
+from collections.abc import Callable, Iterator
+
+from . import ListIn, MappedReader, SharedReader, _unpickle_list
+
+B = TypeVar("B")
+R = TypeVar("R")
+
+
+def _map_elements(fn: Callable[[Any], R], chunk: ListIn) -> list[R]:
+    return [fn(v) for v in chunk]
+
+
+def map_list(
+    fn: Callable[[Any], R],
+    list_in: ListIn[B],
+    workers: int | None = None,
+    chunk: int | None = None,
+    ranges: bool = False,
+    executor: concurrent.futures.Executor | None = None,
+) -> Iterator[R]:
+    """Return an iterator of fn applied to each element of list_in, in order,
+    computed by workers processes, by default one per cpu.
+
+    The list is split into slices of chunk elements, each of which is handled
+    by one worker. If ranges is True fn is called with each slice, a ListIn,
+    and the iterator returns its results instead. At most two slices per
+    worker are in progress or waiting to be consumed at a time. fn must be
+    picklable, such as a function defined at module level.
+
+    If list_in was not read with a MappedReader or SharedReader, its message
+    is copied into a SharedReader for the duration of the call. The work may
+    be done by an existing executor instead of a new process pool"""
+    if list_in._source is None:
+        raise TypeError("Only lists read from a message can be mapped")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunk is None:
+        chunk = max(1, -(-len(list_in) // (workers * 8)))
+    return _map_list(fn, list_in, workers, chunk, ranges, executor)
+
+
+def _map_list(
+    fn: Callable[[Any], R],
+    list_in: ListIn,
+    workers: int,
+    chunk: int,
+    ranges: bool,
+    executor: concurrent.futures.Executor | None,
+) -> Iterator[R]:
+    reader = list_in._reader
+    shared = None
+    if not isinstance(reader, (MappedReader, SharedReader)):
+        reader._fill(0, len(reader._data))
+        shared = SharedReader(reader._data, reader._zero_copy)
+        shared._trusted, shared._verified = reader._trusted, reader._verified
+        list_in = _unpickle_list(
+            shared, list_in._source, list_in._offset, len(list_in), list_in._range
+        )
+    pool = executor or concurrent.futures.ProcessPoolExecutor(workers)
+    task, args = (fn, ()) if ranges else (_map_elements, (fn,))
+    pending: collections.deque[concurrent.futures.Future] = collections.deque()
+    try:
+        for c in list_in.chunks(chunk):
+            if len(pending) >= 2 * workers:
+                f = pending.popleft()
+                yield from [f.result()] if ranges else f.result()
+            pending.append(pool.submit(task, *args, c))
+        while pending:
+            f = pending.popleft()
+            yield from [f.result()] if ranges else f.result()
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
+        if shared is not None:
+            shared.unlink()
@@ -4,6 +4,7 @@ Generate python reader/wirter
 
 import math
 import os
+import struct
 from typing import NamedTuple, TextIO
 from .documents import Documents
 
@@ -100,6 +101,46 @@ class Generator:
         else:
             raise ICE()
 
+    def out_list_from_constructor(self, node: Value, inplace: bool) -> str:
+        assert node.type_ is not None
+        if not inplace:
+            if node.type_.type == TokenType.BOOL:
+                return "construct_bool_list_from(values)"
+            elif node.type_.type in typeMap:
+                return "construct_%s_list_from(values)" % (typeMap[node.type_.type].n)
+            elif node.struct:
+                return "construct_struct_list_from(%s, values)" % (node.struct.name)
+            elif node.enum:
+                return "construct_enum_list_from(%s, values)" % (node.enum.name)
+            elif node.table and node.direct:
+                return "construct_direct_table_list_from(%sOut, values)" % (
+                    node.table.name
+                )
+        elif node.type_.type == TokenType.BOOL:
+            return "scalgoproto.BoolListOut._from(self._writer, values, False)"
+        elif node.type_.type in typeMap:
+            ti = typeMap[node.type_.type]
+            return (
+                "scalgoproto.BasicListOut[%s]._from(self._writer, '%s', %d, values, False)"
+                % (ti.p, ti.s, ti.w)
+            )
+        elif node.struct:
+            return (
+                "scalgoproto.StructListOut[%s]._from(self._writer, %s, values, False)"
+                % (node.struct.name, node.struct.name)
+            )
+        elif node.enum:
+            return (
+                "scalgoproto.EnumListOut[%s]._from(self._writer, %s, values, False)"
+                % (node.enum.name, node.enum.name)
+            )
+        elif node.table and node.direct:
+            return (
+                "scalgoproto.DirectTableListOut[%sOut]._from(self._writer, %sOut, values, False)"
+                % (node.table.name, node.table.name)
+            )
+        raise ICE()
+
     def in_list_help(self, node: Value, os: str) -> tuple[str, str]:
         assert node.type_ is not None
         if node.type_.type == TokenType.BOOL:
@@ -181,6 +222,25 @@ class Generator:
             self.o("%s%s" % (indent, line))
         self.o('%s"""' % indent)
 
+    def has_array(self, node: Value) -> bool:
+        assert node.type_ is not None
+        return bool(node.type_.type in typeMap or node.enum or node.struct)
+
+    def has_from(self, node: Value) -> bool:
+        return self.has_array(node) or bool(node.table and node.direct)
+
+    def generate_array_in(self, node: Value, uname: str, pre: list[str]) -> None:
+        self.o("    @property")
+        self.o("    def %s_array(self) -> typing_.Any:" % uname)
+        self.o(
+            '        """Return %s as a numpy array, see scalgoproto.ListIn.as_numpy"""'
+            % uname
+        )
+        for line in pre:
+            self.o(line)
+        self.o("        return self.%s.as_numpy()" % uname)
+        self.o()
+
     def generate_list_in(self, node: Value, uname: str) -> None:
         (tn, acc) = self.in_list_help(
             node,
@@ -201,12 +261,20 @@ class Generator:
             self.o("            return None")
             self.o(acc)
             self.o()
+            if self.has_array(node):
+                self.generate_array_in(
+                    node,
+                    uname,
+                    ["        if not self.has_%s:" % uname, "            return None"],
+                )
         else:
             self.o("    @property")
             self.o("    def %s(self) -> scalgoproto.ListIn[%s]:" % (uname, tn))
             self.output_doc(node, "        ")
             self.o(acc)
             self.o()
+            if self.has_array(node):
+                self.generate_array_in(node, uname, [])
 
     def generate_union_list_in(self, node: Value, uname: str) -> None:
         (tn, acc) = self.in_list_help(
@@ -219,6 +287,8 @@ class Generator:
         self.o("        assert self.is_%s" % (uname))
         self.o(acc)
         self.o()
+        if self.has_array(node):
+            self.generate_array_in(node, uname, ["        assert self.is_%s" % uname])
 
     def generate_inplace_list_constructor(self, node: Value) -> None:
         assert node.type_ is not None
@@ -255,6 +325,24 @@ class Generator:
         elif node.type_.type == TokenType.BYTES:
             self.o("        l = scalgoproto.BytesListOut(self._writer, size, False)")
 
+    def generate_list_from_out(self, node: Value, uname: str, ot: str) -> None:
+        if node.table:
+            self.o("    def %s_from(self, values: typing_.Any) -> %s:" % (uname, ot))
+            suffix = [
+                "Construct %s in one step from a numpy structured array or a" % uname,
+                "mapping from member names to columns, see",
+                "scalgoproto.Writer.construct_direct_table_list_from",
+            ]
+        else:
+            self.o(
+                "    def %s_from(self, values: typing_.Iterable[%s]) -> %s:"
+                % (uname, self.in_list_help(node, "")[0], ot)
+            )
+            suffix = [
+                "Construct %s from an iterable or numpy array in one step" % uname
+            ]
+        self.output_doc(node, "        ", suffix=suffix)
+
     def generate_list_out(self, node: Value, uname: str) -> None:
         it = "scalgoproto.ListIn[%s]" % self.in_list_help(node, "")[0]
         ot = self.out_list_type(node)
@@ -281,6 +369,15 @@ class Generator:
             self.o("        self._set_list(%d, res)" % (node.offset))
             self.o("        return res")
             self.o()
+            if self.has_from(node):
+                self.generate_list_from_out(node, uname, ot)
+                self.o(
+                    "        res = self._writer.%s"
+                    % self.out_list_from_constructor(node, False)
+                )
+                self.o("        self._set_list(%d, res)" % (node.offset))
+                self.o("        return res")
+                self.o()
         else:
             self.o("    @scalgoproto.Adder")
             self.o("    def %s(self, value: %s) -> None:" % (uname, it))
@@ -301,6 +398,15 @@ class Generator:
             self.o("        self._set_inplace_list(%d, size)" % (node.offset))
             self.o("        return l")
             self.o()
+            if self.has_from(node):
+                self.generate_list_from_out(node, uname, ot)
+                self.o(
+                    "        assert self._writer._used == self._offset + self._SIZE, 'No object may be created between table and its implace list'"
+                )
+                self.o("        l = %s" % self.out_list_from_constructor(node, True))
+                self.o("        self._set_inplace_list(%d, len(l))" % (node.offset))
+                self.o("        return l")
+                self.o()
 
     def generate_union_list_out(
         self, node: Value, uname: str, idx: int, inplace: bool
@@ -327,6 +433,15 @@ class Generator:
             self.o("        self._set(%d, res._offset - 10)" % (idx,))
             self.o("        return res")
             self.o()
+            if self.has_from(node):
+                self.generate_list_from_out(node, uname, ot)
+                self.o(
+                    "        res = self._writer.%s"
+                    % self.out_list_from_constructor(node, False)
+                )
+                self.o("        self._set(%d, res._offset - 10)" % (idx,))
+                self.o("        return res")
+                self.o()
         else:
             self.o("    @scalgoproto.Adder")
             self.o("    def %s(self, value: %s) -> None:" % (uname, it))
@@ -346,6 +461,15 @@ class Generator:
             self.generate_inplace_list_constructor(node)
             self.o("        return l")
             self.o()
+            if self.has_from(node):
+                self.generate_list_from_out(node, uname, ot)
+                self.o(
+                    "        assert self._writer._used == self._end, 'No object may be created between table and its implace list'"
+                )
+                self.o("        l = %s" % self.out_list_from_constructor(node, True))
+                self.o("        self._set(%d, len(l))" % (idx,))
+                self.o("        return l")
+                self.o()
 
     def generate_bool_in(self, node: Value, uname: str) -> None:
         if node.inplace:
@@ -709,7 +833,7 @@ class Generator:
                 "        (o, s) = self._get_ptr%s(%d, scalgoproto.TEXT_MAGIC)"
                 % ("_inplace" if node.inplace else "", node.offset)
             )
-            self.o('        return self._reader._data[o : o + s].decode("utf-8")')
+            self.o("        return self._reader._get_text(o, s)")
             self.o()
         else:
             self.o("    @property")
@@ -721,7 +845,7 @@ class Generator:
                 "        (o, s) = self._get_ptr%s(%d, scalgoproto.TEXT_MAGIC)"
                 % ("_inplace" if node.inplace else "", node.offset)
             )
-            self.o('        return self._reader._data[o : o + s].decode("utf-8")')
+            self.o("        return self._reader._get_text(o, s)")
             self.o()
 
     def generate_union_text_in(self, node: Value, uname: str) -> None:
@@ -730,7 +854,7 @@ class Generator:
         self.output_doc(node, "        ")
         self.o("        assert self.is_%s" % (uname))
         self.o("        (o, s) = self._get_ptr(scalgoproto.TEXT_MAGIC)")
-        self.o('        return self._reader._data[o : o + s].decode("utf-8")')
+        self.o("        return self._reader._get_text(o, s)")
         self.o()
 
     def generate_text_out(self, node: Value, uname: str) -> None:
@@ -782,7 +906,7 @@ class Generator:
                 "        (o, s) = self._get_ptr%s(%d, scalgoproto.BYTES_MAGIC)"
                 % ("_inplace" if node.inplace else "", node.offset)
             )
-            self.o("        return self._reader._data[o : o + s]")
+            self.o("        return self._reader._get_bytes(o, s)")
             self.o()
         else:
             self.o("    @property")
@@ -794,7 +918,7 @@ class Generator:
                 "        (o, s) = self._get_ptr%s(%d, scalgoproto.BYTES_MAGIC)"
                 % ("_inplace" if node.inplace else "", node.offset)
             )
-            self.o("        return self._reader._data[o : o + s]")
+            self.o("        return self._reader._get_bytes(o, s)")
             self.o()
 
     def generate_union_bytes_in(self, node: Value, uname: str) -> None:
@@ -803,7 +927,7 @@ class Generator:
         self.output_doc(node, "        ")
         self.o("        assert self.is_%s" % (uname))
         self.o("        (o, s) = self._get_ptr(scalgoproto.BYTES_MAGIC)")
-        self.o("        return self._reader._data[o : o + s]")
+        self.o("        return self._reader._get_bytes(o, s)")
         self.o()
 
     def generate_bytes_out(self, node: Value, uname: str) -> None:
@@ -965,7 +1089,7 @@ class Generator:
             elif (
                 node.type_.type == TokenType.TEXT or node.type_.type == TokenType.BYTES
             ):
-                self.o("            self.add_%s(i.%s)" % (uuname, uuname))
+                self.o("            self.%s = i.%s" % (uuname, uuname))
             elif node.table:
                 if node.table.empty:
                     self.o("            self.add_%s()" % (uuname))
@@ -994,6 +1118,14 @@ class Generator:
         for node in union.members:
             self.o('        "%s",' % snake(self.value(node.identifier)))
         self.o("    ]")
+        self.o("    _POINTERS = (")
+        for node in union.members:
+            assert node.type_ is not None
+            if node.type_.type == TokenType.REMOVED:
+                self.o("        None,")
+            else:
+                self.o("        %s," % self.pointer_layout(node, True))
+        self.o("    )")
         self.o()
         self.o(
             "    def __init__(self, reader: scalgoproto.Reader, type: int, offset: int, size: int | None = None) -> None:"
@@ -1038,6 +1170,7 @@ class Generator:
                 self.generate_union_text_in(member, uuname)
             else:
                 raise ICE()
+        self.generate_union_to_dict(union)
         self.o()
 
         self.o("class %sOut(scalgoproto.UnionOut):" % union.name)
@@ -1067,6 +1200,7 @@ class Generator:
             else:
                 raise ICE()
         self.generate_union_copy(union)
+        self.generate_union_from_dict(union)
         self.o()
 
         self.o("class %sInplaceOut(scalgoproto.UnionOut):" % union.name)
@@ -1096,65 +1230,445 @@ class Generator:
             else:
                 raise ICE()
         self.generate_union_copy(union)
+        self.generate_union_from_dict(union)
         self.o()
 
+    def pointer_layout(self, node: Value, in_union: bool = False) -> str | None:
+        """Return the scalgoproto.Pointer describing node, or None if node is
+        stored in the fixed size part of the table. Members of unions have no
+        slot of their own, so their offset is 0"""
+        assert node.type_ is not None
+        if node.list_:
+            if node.type_.type == TokenType.BOOL:
+                kind, t = "bool", "None"
+            elif node.type_.type in typeMap:
+                kind, t = "basic", '"%s"' % typeMap[node.type_.type].s
+            elif node.enum:
+                kind, t = "enum", node.enum.name
+            elif node.struct:
+                kind, t = "struct", node.struct.name
+            elif node.table:
+                kind = "direct" if node.direct else "table"
+                t = "None" if node.table.empty else "%sIn" % node.table.name
+            elif node.union:
+                kind, t = "union", "%sIn" % node.union.name
+            elif node.type_.type == TokenType.TEXT:
+                kind, t = "text", "None"
+            elif node.type_.type == TokenType.BYTES:
+                kind, t = "bytes", "None"
+            else:
+                raise ICE()
+        elif node.table:
+            kind = "table"
+            t = "None" if node.table.empty else "%sIn" % node.table.name
+        elif node.union:
+            kind, t = "union", "%sIn" % node.union.name
+        elif node.type_.type == TokenType.TEXT:
+            kind, t = "text", "None"
+        elif node.type_.type == TokenType.BYTES:
+            kind, t = "bytes", "None"
+        else:
+            return None
+        return 'scalgoproto.Pointer(%d, "%s", %s, %s, %s)' % (
+            0 if in_union else node.offset,
+            kind,
+            t,
+            bool(node.list_),
+            bool(node.inplace),
+        )
+
+    def column_layout(self, node: Value) -> str | None:
+        """Return the scalgoproto.Column describing node, or None if node is
+        not stored in the fixed size part of the table"""
+        assert node.type_ is not None
+        if node.list_ or node.inplace:
+            return None
+        if node.type_.type == TokenType.BOOL:
+            kind, t = "bool", "None"
+        elif node.type_.type in typeMap:
+            kind, t = "basic", '"%s"' % typeMap[node.type_.type].s
+        elif node.enum:
+            kind, t = "enum", node.enum.name
+        elif node.struct:
+            kind, t = "struct", node.struct.name
+        else:
+            return None
+        # Optional floats are absent when NaN and enums when out of range, other
+        # optional members have a presence bit
+        has = ""
+        if (
+            node.optional
+            and kind != "enum"
+            and node.type_.type not in (TokenType.F32, TokenType.F64)
+        ):
+            has = ", %d, %d" % (node.has_offset, node.has_bit)
+        return 'scalgoproto.Column(%d, "%s", %s, %d, %s%s)' % (
+            node.offset,
+            kind,
+            t,
+            node.bit if kind == "bool" else 0,
+            bool(node.optional),
+            has,
+        )
+
+    def generate_member_copy(self, node: Value, indent: str) -> None:
+        uname = snake(self.value(node.identifier))
+        assert node.type_ is not None
+        if node.list_:
+            if node.optional:
+                self.o("%sif i.%s is not None:" % (indent, uname))
+                self.o(
+                    "%s    self.add_%s(len(i.%s))._copy(i.%s)"
+                    % (indent, uname, uname, uname)
+                )
+            else:
+                self.o(
+                    "%sself.add_%s(len(i.%s))._copy(i.%s)"
+                    % (indent, uname, uname, uname)
+                )
+        elif (
+            node.type_.type in typeMap
+            or node.type_.type == TokenType.BOOL
+            or node.enum
+            or node.struct
+            or node.type_.type == TokenType.TEXT
+            or node.type_.type == TokenType.BYTES
+        ):
+            if (
+                node.optional
+                or node.enum
+                or node.type_.type == TokenType.TEXT
+                or node.type_.type == TokenType.BYTES
+            ):
+                self.o("%sif i.%s is not None:" % (indent, uname))
+                self.o("%s    self.%s = i.%s" % (indent, uname, uname))
+            else:
+                self.o("%sself.%s = i.%s" % (indent, uname, uname))
+        elif node.table:
+            if node.optional:
+                self.o("%sif i.%s is not None:" % (indent, uname))
+                if node.table.empty:
+                    self.o("%s    self.add_%s()" % (indent, uname))
+                else:
+                    self.o("%s    self.add_%s()._copy(i.%s)" % (indent, uname, uname))
+            else:
+                if node.table.empty:
+                    self.o("%sself.add_%s()" % (indent, uname))
+                else:
+                    self.o("%sself.add_%s()._copy(i.%s)" % (indent, uname, uname))
+        elif node.union:
+            self.o("%sif i.%s is not None:" % (indent, uname))
+            self.o("%s    self.%s._copy(i.%s)" % (indent, uname, uname))
+        else:
+            raise ICE()
+
     def generate_table_copy(self, table: Table) -> None:
         self.o("    def _copy(self, i:%sIn) -> None:" % table.name)
+        # Members in the fixed size part are copied in one go by _copy_fixed
+        # when i is the same table, otherwise they are copied one by one
+        fixed = [n for n in table.members if self.pointer_layout(n) is None]
+        if fixed:
+            self.o("        if not self._copy_fixed(i):")
+            for node in fixed:
+                self.generate_member_copy(node, "            ")
+        else:
+            self.o("        self._copy_fixed(i)")
+        # Inplace members must be copied first, as they follow the table
+        for ip in (True, False):
+            for node in table.members:
+                if bool(node.inplace) == ip and self.pointer_layout(node) is not None:
+                    self.generate_member_copy(node, "        ")
+        self.o()
+
+    def list_to_dict(self, node: Value, value: str) -> str:
+        """Return the expression converting the list value of node for _to_dict"""
+        assert node.type_ is not None
+        if node.struct or node.table or node.union:
+            return "%s._to_dict()" % value
+        return "%s.tolist()" % value
+
+    def member_to_dict(
+        self, node: Value, uname: str
+    ) -> tuple[list[str], str | None, str, str]:
+        """Return how _to_dict and __str__ of a table read node.
+
+        Returns the statements to run first, the condition for node to have a
+        value or None if it always has one, the expression for the value and the
+        expression for its _to_dict representation"""
+        assert node.type_ is not None
+        has = "self.has_%s" % uname if node.optional else None
+        if node.list_:
+            v = "self.%s" % uname
+            return ([], has, v, self.list_to_dict(node, v))
+        if node.type_.type == TokenType.BOOL:
+            if node.optional:
+                has = "self._get_bit(%d, %s, False)" % (node.has_offset, node.has_bit)
+            v = "self._get_bit(%d, %s, False)" % (node.offset, node.bit)
+            return ([], has, v, v)
+        if node.type_.type in typeMap:
+            ti = typeMap[node.type_.type]
+            if node.optional and node.type_.type in (TokenType.F32, TokenType.F64):
+                return (
+                    ["v = self._get_%s(%d, math_.nan)" % (ti.n, node.offset)],
+                    "not math_.isnan(v)",
+                    "v",
+                    "v",
+                )
+            if node.optional:
+                has = "self._get_bit(%d, %s, False)" % (node.has_offset, node.has_bit)
+            v = "self._get_%s(%d, %s)" % (
+                ti.n,
+                node.offset,
+                node.parsed_value if not math.isnan(node.parsed_value) else "math_.nan",
+            )
+            return ([], has, v, v)
+        if node.enum:
+            return (
+                ["v = self._get_uint8(%d, %s)" % (node.offset, node.parsed_value)],
+                "v < %d" % len(node.enum.members),
+                "%s(v)" % node.enum.name,
+                "%s(v)" % node.enum.name,
+            )
+        if node.struct:
+            if node.optional:
+                has = "self._get_bit(%d, %s, False)" % (node.has_offset, node.has_bit)
+            v = (
+                "(%s._read(self._reader, self._offset + %d) if %d < self._size else %s())"
+                % (node.struct.name, node.offset, node.offset, node.struct.name)
+            )
+            return ([], has, v, "%s._to_dict()" % v)
+        if node.table and node.table.empty:
+            return ([], has, "{}", "{}")
+        if node.table or node.union:
+            v = "self.%s" % uname
+            return ([], has, v, "%s._to_dict()" % v)
+        if node.type_.type in (TokenType.TEXT, TokenType.BYTES):
+            v = "self.%s" % uname
+            return ([], has, v, v)
+        raise ICE()
+
+    def generate_table_to_dict(self, table: Table) -> None:
+        members = [
+            (snake(self.value(node.identifier)), node)
+            for node in table.members
+            if node.type_ is not None and node.type_.type != TokenType.REMOVED
+        ]
+        self.o("    def _to_dict(self) -> dict[str, typing_.Any]:")
+        self.o("        o: dict[str, typing_.Any] = {}")
+        for uname, node in members:
+            pre, has, _, v = self.member_to_dict(node, uname)
+            for line in pre:
+                self.o("        %s" % line)
+            if has is None:
+                self.o('        o["%s"] = %s' % (uname, v))
+            else:
+                self.o("        if %s:" % has)
+                self.o('            o["%s"] = %s' % (uname, v))
+        self.o("        return o")
+        self.o()
+        self.o("    def __str__(self) -> str:")
+        self.o("        o: list[str] = []")
+        for uname, node in members:
+            pre, has, v, _ = self.member_to_dict(node, uname)
+            for line in pre:
+                self.o("        %s" % line)
+            if has is None:
+                self.o('        o.append("%s: %%s" %% (%s,))' % (uname, v))
+            else:
+                self.o("        if %s:" % has)
+                self.o('            o.append("%s: %%s" %% (%s,))' % (uname, v))
+        self.o('        return "{%s}" % ", ".join(o)')
+        self.o()
+
+    def generate_union_to_dict(self, union: Union) -> None:
+        members: list[tuple[int, str, str, str]] = []
+        for idx, node in enumerate(union.members, start=1):
+            assert node.type_ is not None
+            if node.type_.type == TokenType.REMOVED:
+                continue
+            uname = snake(self.value(node.identifier))
+            if node.list_:
+                v = self.in_list_help(
+                    node,
+                    f"*self._get_ptr(scalgoproto.{'DIRECT_' if node.direct else ''}LIST_MAGIC)",
+                )[1].strip()[len("return ") :]
+                members.append((idx, uname, v, self.list_to_dict(node, v)))
+            elif node.table and node.table.empty:
+                members.append((idx, uname, "", "None"))
+            elif node.table:
+                v = "%sIn(self._reader, *self._get_ptr(%sIn._MAGIC))" % (
+                    node.table.name,
+                    node.table.name,
+                )
+                members.append((idx, uname, v, "%s._to_dict()" % v))
+            elif node.type_.type == TokenType.TEXT:
+                v = "self._reader._get_text(*self._get_ptr(scalgoproto.TEXT_MAGIC))"
+                members.append((idx, uname, v, v))
+            elif node.type_.type == TokenType.BYTES:
+                v = "self._reader._get_bytes(*self._get_ptr(scalgoproto.BYTES_MAGIC))"
+                members.append((idx, uname, v, v))
+            else:
+                raise ICE()
+        # Members unknown to the schema are handled by scalgoproto.UnionIn
+        self.o("    def _to_dict(self) -> dict[str, typing_.Any]:")
+        self.o("        t = self._type")
+        self.o("        if t == 0:")
+        self.o("            return {}")
+        for idx, uname, _, v in members:
+            self.o("        if t == %d:" % idx)
+            self.o('            return {"%s": %s}' % (uname, v))
+        self.o("        return super()._to_dict()")
+        self.o()
+        self.o("    def __str__(self) -> str:")
+        self.o("        t = self._type")
+        self.o("        if t == 0:")
+        self.o('            return "{}"')
+        for idx, uname, v, _ in members:
+            self.o("        if t == %d:" % idx)
+            if v:
+                self.o('            return "{%s: %%s}" %% (%s,)' % (uname, v))
+            else:
+                self.o('            return "{%s}"' % uname)
+        self.o("        return super().__str__()")
+        self.o()
+
+    def list_from_dict(self, node: Value, uname: str) -> str:
+        """Return the statement adding the list v to member uname in _from_dict"""
+        if node.struct:
+            return "self.%s_from(map(%s._from_dict, v))" % (uname, node.struct.name)
+        if self.has_array(node):
+            return "self.%s_from(v)" % uname
+        return "self.add_%s(len(v))._from_dict(v)" % uname
+
+    def fixed_layout(self, table: Table) -> tuple[str, int, list[str]] | None:
+        """Return the struct format, offset and pack arguments used by _from_dict
+        to write the numbers and enums in the fixed size part of table in one
+        go, or None if there are none. The bytes between them are written with
+        their defaults"""
+        assert table.default is not None
+        packed = []
+        for node in table.members:
+            assert node.type_ is not None
+            if node.list_ or node.inplace or node.type_.type == TokenType.BOOL:
+                continue
+            if node.type_.type in typeMap or node.enum:
+                packed.append(node)
+        if not packed:
+            return None
+        packed.sort(key=lambda node: node.offset)
+        fmt = []
+        args = []
+        pos = packed[0].offset
+        for node in packed:
+            assert node.type_ is not None
+            if node.offset > pos:
+                fmt.append("%ds" % (node.offset - pos))
+                args.append('b"%s"' % cescape(table.default[pos : node.offset]))
+            if node.enum:
+                fmt.append("B")
+                pos = node.offset + 1
+            else:
+                ti = typeMap[node.type_.type]
+                fmt.append(ti.s)
+                pos = node.offset + ti.w
+            # JSON null is the default, like for the other members
+            args.append(
+                'v if (v := d.get("%s")) is not None else %s'
+                % (
+                    snake(self.value(node.identifier)),
+                    node.parsed_value
+                    if not math.isnan(node.parsed_value)
+                    else "math_.nan",
+                )
+            )
+        return ("<" + "".join(fmt), packed[0].offset, args)
+
+    def generate_table_from_dict(self, table: Table) -> None:
+        self.o("    def _from_dict(self, d: dict[str, typing_.Any]) -> None:")
+        if all(
+            node.type_ is not None and node.type_.type == TokenType.REMOVED
+            for node in table.members
+        ):
+            self.o("        pass")
+        fixed = self.fixed_layout(table)
+        if fixed is not None:
+            self.o("        self._FIXED.pack_into(")
+            self.o("            self._writer._data,")
+            self.o("            self._offset + %d," % fixed[1])
+            for a in fixed[2]:
+                self.o("            %s," % a)
+            self.o("        )")
+        for node in table.members:
+            assert node.type_ is not None
+            uname = snake(self.value(node.identifier))
+            if node.list_ or node.inplace:
+                continue
+            if node.type_.type == TokenType.BOOL:
+                self.o('        v = d.get("%s")' % uname)
+                self.o("        if v is not None:")
+                self.o("            self.%s = v" % uname)
+            elif node.struct:
+                self.o('        v = d.get("%s")' % uname)
+                self.o("        if v is not None:")
+                self.o(
+                    "            self.%s = %s._from_dict(v)" % (uname, node.struct.name)
+                )
+            elif (
+                node.type_.type in typeMap
+                and node.optional
+                and node.type_.type not in (TokenType.F32, TokenType.F64)
+            ):
+                self.o('        if d.get("%s") is not None:' % uname)
+                self.o(
+                    "            self._set_bit(%d, %d)"
+                    % (node.has_offset, node.has_bit)
+                )
+        # Inplace members must be added first, as they follow the table
         for ip in (True, False):
             for node in table.members:
-                uname = snake(self.value(node.identifier))
-                if bool(node.inplace) != ip:
-                    continue
                 assert node.type_ is not None
+                if bool(node.inplace) != ip or self.pointer_layout(node) is None:
+                    continue
+                uname = snake(self.value(node.identifier))
+                self.o('        v = d.get("%s")' % uname)
                 if node.list_:
-                    if node.optional:
-                        self.o("        if i.%s is not None:" % uname)
-                        self.o(
-                            "            self.add_%s(len(i.%s))._copy(i.%s)"
-                            % (uname, uname, uname)
-                        )
-                    else:
-                        self.o(
-                            "        self.add_%s(len(i.%s))._copy(i.%s)"
-                            % (uname, uname, uname)
-                        )
-                elif (
-                    node.type_.type in typeMap
-                    or node.type_.type == TokenType.BOOL
-                    or node.enum
-                    or node.struct
-                    or node.type_.type == TokenType.TEXT
-                    or node.type_.type == TokenType.BYTES
-                ):
-                    if (
-                        node.optional
-                        or node.enum
-                        or node.type_.type == TokenType.TEXT
-                        or node.type_.type == TokenType.BYTES
-                    ):
-                        self.o("        if i.%s is not None:" % uname)
-                        self.o("            self.%s = i.%s" % (uname, uname))
-                    else:
-                        self.o("        self.%s = i.%s" % (uname, uname))
+                    self.o("        if v is not None:")
+                    self.o("            %s" % self.list_from_dict(node, uname))
+                elif node.table and node.table.empty:
+                    self.o("        if v is not None:")
+                    self.o("            self.add_%s()" % uname)
                 elif node.table:
-                    if node.optional:
-                        self.o("        if i.%s is not None:" % (uname))
-                        if node.table.empty:
-                            self.o("            self.add_%s()")
-                        else:
-                            self.o(
-                                "            self.add_%s()._copy(i.%s)" % (uname, uname)
-                            )
-                    else:
-                        if node.table.empty:
-                            self.o("        self.add_%s()")
-                        else:
-                            self.o("        self.add_%s()._copy(i.%s)" % (uname, uname))
+                    self.o("        if v is not None:")
+                    self.o("            self.add_%s()._from_dict(v)" % uname)
                 elif node.union:
-                    self.o("        if i.%s is not None:" % (uname))
-                    self.o("            self.%s._copy(i.%s)" % (uname, uname))
+                    self.o("        if v:")
+                    self.o("            self.%s._from_dict(v)" % uname)
                 else:
-                    raise ICE()
+                    self.o("        if v is not None:")
+                    self.o("            self.%s = v" % uname)
+        self.o()
+
+    def generate_union_from_dict(self, union: Union) -> None:
+        self.o("    def _from_dict(self, d: dict[str, typing_.Any]) -> None:")
+        self.o("        for k, v in d.items():")
+        branch = "if"
+        for node in union.members:
+            assert node.type_ is not None
+            if node.type_.type == TokenType.REMOVED:
+                continue
+            uname = snake(self.value(node.identifier))
+            self.o('            %s k == "%s":' % (branch, uname))
+            branch = "elif"
+            if node.list_:
+                self.o("                %s" % self.list_from_dict(node, uname))
+            elif node.table and node.table.empty:
+                self.o("                self.add_%s()" % uname)
+            elif node.table:
+                self.o("                self.add_%s()._from_dict(v)" % uname)
+            else:
+                self.o("                self.%s = v" % uname)
+        if branch == "if":
+            self.o("            pass")
         self.o()
 
     def generate_table(self, table: Table) -> None:
@@ -1179,14 +1693,38 @@ class Generator:
         self.o(
             "    _MAGIC: typing_.ClassVar[int] = 0x%08X # type: ignore" % table.magic
         )
+        assert table.default is not None
+        self.o('    _DEFAULT: typing_.ClassVar[bytes] = b"%s"' % cescape(table.default))
         self.o("    _MEMBERS = [")
         for node in table.members:
             self.o('        "%s",' % snake(self.value(node.identifier)))
         self.o("    ]")
+        pointers = [self.pointer_layout(node) for node in table.members]
+        pointers = [p for p in pointers if p is not None]
+        if pointers:
+            self.o("    _POINTERS = (")
+            for p in pointers:
+                self.o("        %s," % p)
+            self.o("    )")
+        else:
+            self.o("    _POINTERS = ()")
+        columns = [
+            (snake(self.value(node.identifier)), self.column_layout(node))
+            for node in table.members
+        ]
+        columns = [(n, c) for (n, c) in columns if c is not None]
+        if columns:
+            self.o("    _COLUMNS = {")
+            for n, c in columns:
+                self.o('        "%s": %s,' % (n, c))
+            self.o("    }")
+        else:
+            self.o("    _COLUMNS = {}")
         self.o()
 
         for node in table.members:
             self.generate_value_in(table, node)
+        self.generate_table_to_dict(table)
         self.o()
 
         assert table.default is not None
@@ -1200,13 +1738,53 @@ class Generator:
         self.o("    _SIZE: typing_.ClassVar[int] = %d" % len(table.default))
         self.o('    _DEFAULT: typing_.ClassVar[bytes] = b"%s"' % cescape(table.default))
         self.o("    _IN = %sIn" % (table.name))
+        fixed = self.fixed_layout(table)
+        if fixed is not None:
+            self.o(
+                '    _FIXED: typing_.ClassVar[struct.Struct] = struct.Struct("%s")'
+                % fixed[0]
+            )
         self.o()
 
         for node in table.members:
             self.generate_value_out(table, node)
         self.generate_table_copy(table)
+        self.generate_table_from_dict(table)
         self.o()
 
+    def struct_codec(
+        self, node: Struct, path: str, index: list[int]
+    ) -> tuple[str, list[str], str]:
+        """Flatten the packed layout of node, including nested structs.
+
+        Returns the struct format, the expressions packing the members of the
+        instance at path and the expression constructing an instance from the
+        unpacked tuple v, whose first unused entry is index[0]"""
+        fmt: list[str] = []
+        pack: list[str] = []
+        args: list[str] = []
+        for v in node.members:
+            n = "%s.%s" % (path, snake(self.value(v.identifier)))
+            assert v.type_ is not None
+            if v.type_.type in typeMap:
+                fmt.append(typeMap[v.type_.type].s)
+                pack.append(n)
+                args.append("v[%d]" % index[0])
+                index[0] += 1
+            elif v.enum:
+                fmt.append("B")
+                pack.append("int(%s)" % n)
+                args.append("%s(v[%d])" % (v.enum.name, index[0]))
+                index[0] += 1
+            elif v.struct:
+                f, p, a = self.struct_codec(v.struct, n, index)
+                fmt.append(f)
+                pack.extend(p)
+                args.append(a)
+            else:
+                raise ICE()
+        return ("".join(fmt), pack, "%s(%s)" % (node.name, ", ".join(args)))
+
     def generate_struct(self, node: Struct) -> None:
         # Recursively generate direct contained members
         for value in node.members:
@@ -1218,45 +1796,57 @@ class Generator:
         self.o("class %s(scalgoproto.StructType):" % node.name)
         init = []
         copy = []
-        write = []
-        read = []
         slots = []
+        dtype = []
+        to_dict = []
+        from_dict = []
+        names = []
         for v in node.members:
             n = snake(self.value(v.identifier))
+            names.append(n)
             copy.append("self.%s = %s" % (n, n))
             slots.append('"%s"' % n)
+            if v.struct:
+                to_dict.append('"%s": self.%s._to_dict()' % (n, n))
+            else:
+                to_dict.append('"%s": self.%s' % (n, n))
             assert v.type_ is not None
             if v.type_.type in typeMap:
                 ti = typeMap[v.type_.type]
                 if v.type_.type in (TokenType.F32, TokenType.F64):
                     init.append("%s: %s = 0.0" % (n, ti.p))
+                    from_dict.append('d.get("%s", 0.0)' % n)
                 elif v.type_.type == TokenType.BOOL:
                     init.append("%s: %s = False" % (n, ti.p))
+                    from_dict.append('d.get("%s", False)' % n)
                 else:
                     init.append("%s: %s = 0" % (n, ti.p))
-                write.append(
-                    'writer._data[offset + %d : offset + %d] = struct.pack("<%s", ins.%s)'
-                    % (v.offset, v.offset + ti.w, ti.s, n)
-                )
-                read.append(
-                    'struct.unpack("<%s", reader._data[offset + %d : offset + %d])[0]'
-                    % (ti.s, v.offset, v.offset + ti.w)
-                )
+                    from_dict.append('d.get("%s", 0)' % n)
+                dtype.append('("%s", "<%s", %d)' % (n, ti.s, v.offset))
             elif v.enum:
                 init.append("%s: %s = %s(0)" % (n, v.enum.name, v.enum.name))
-                write.append("writer._data[offset + %d] = int(ins.%s)" % (v.offset, n))
-                read.append("%s(reader._data[offset + %d])" % (v.enum.name, v.offset))
+                from_dict.append('d.get("%s", %s(0))' % (n, v.enum.name))
+                dtype.append('("%s", "B", %d)' % (n, v.offset))
             elif v.struct:
                 init.append("%s: %s = %s()" % (n, v.struct.name, v.struct.name))
-                write.append(
-                    "%s._write(writer, offset + %d, ins.%s)"
-                    % (v.struct.name, v.offset, n)
+                from_dict.append(
+                    '%s._from_dict(d["%s"]) if "%s" in d else %s()'
+                    % (v.struct.name, n, n, v.struct.name)
                 )
-                read.append("%s._read(reader, offset + %d)" % (v.struct.name, v.offset))
+                dtype.append('("%s", %s, %d)' % (n, v.struct.name, v.offset))
             else:
                 raise ICE()
+        fmt, pack, read = self.struct_codec(node, "ins", [0])
+        if struct.calcsize("<" + fmt) != node.bytes:
+            raise ICE()
         self.o("    __slots__ = [%s]" % ", ".join(slots))
         self.o("    _WIDTH: typing_.ClassVar[int] = %d" % node.bytes)
+        self.o(
+            '    _STRUCT: typing_.ClassVar[struct.Struct] = struct.Struct("<%s")' % fmt
+        )
+        self.o(
+            "    _NUMPY = (%s%s)" % (", ".join(dtype), "," if len(dtype) == 1 else "")
+        )
         self.o()
         self.o("    def __init__(self, %s) -> None:" % (", ".join(init)))
         for line in copy:
@@ -1267,18 +1857,41 @@ class Generator:
             '    def _write(writer: scalgoproto.Writer, offset: int, ins: "%s") -> None:'
             % node.name
         )
-        for line in write:
-            self.o("        %s" % line)
+        self.o("        %s._STRUCT.pack_into(" % node.name)
+        self.o("            writer._data,")
+        self.o("            offset,")
+        for line in pack:
+            self.o("            %s," % line)
+        self.o("        )")
         self.o()
         self.o("    @staticmethod")
         self.o(
             '    def _read(reader: scalgoproto.Reader, offset: int) -> "%s":'
             % node.name
         )
-        self.o("        return %s(" % node.name)
-        for line in read:
-            self.o("            %s," % line)
-        self.o("        )")
+        self.o("        v = %s._STRUCT.unpack_from(reader._data, offset)" % node.name)
+        self.o("        return %s" % read)
+        self.o()
+        self.o("    @staticmethod")
+        self.o('    def _unpack(v: tuple[typing_.Any, ...]) -> "%s":' % node.name)
+        self.o("        return %s" % read)
+        self.o()
+        self.o("    @staticmethod")
+        self.o('    def _from_dict(d: dict[str, typing_.Any]) -> "%s":' % node.name)
+        self.o("        return %s(%s)" % (node.name, ", ".join(from_dict)))
+        self.o()
+        self.o("    def _to_dict(self) -> dict[str, typing_.Any]:")
+        self.o("        return {%s}" % ", ".join(to_dict))
+        self.o()
+        self.o("    def __str__(self) -> str:")
+        self.o(
+            '        return "{%s}" %% (%s%s)'
+            % (
+                ", ".join("%s: %%s" % n for n in names),
+                ", ".join("self.%s" % n for n in names),
+                "," if len(names) == 1 else "",
+            )
+        )
         self.o()
         self.o()
 
@@ -15,8 +15,11 @@ setup(
     long_description=DESCRIPTION,
     author="https://github.com/Mortal",
     url="https://github.com/Mortal/terrastream-scripts",
-    packages=["", "scalgoprotoc"],
-    package_dir={"scalgoprotoc": "scalgoprotoc", "": "lib/python"},
+    packages=["scalgoproto", "scalgoprotoc"],
+    package_dir={
+        "scalgoprotoc": "scalgoprotoc",
+        "scalgoproto": "lib/python/scalgoproto",
+    },
     include_package_data=True,
     license="MIT",
     entry_points={"console_scripts": ["scalgoprotoc = scalgoprotoc.__main__:main"]},
@@ -181,10 +181,22 @@ def runNeg(name: str, base: str, bad: str, good: str) -> None:
     print("SUCCESS")
 
 
+def bench(args: list[str]) -> None:
+    runPySetup(["test/base.spr", "test/complex2.spr"])
+    code = subprocess.call(
+        ["python3", "test/bench.py"] + args,
+        env={"PYTHONPATH": "lib/python:tmp:test"},
+    )
+    sys.exit(code)
+
+
 def main():
     if not os.path.isdir("tmp"):
         os.mkdir("tmp")
 
+    if sys.argv[1:2] == ["bench"]:
+        bench(sys.argv[2:])
+
     # Test names
     for bad, good in (("monkey", "Monkey"), ("Monkey_Cat", "MonkeyCat")):
         runNeg("bad table name %s" % bad, "table %s @8908828A {}", bad, good)
@@ -333,11 +345,88 @@ def main():
         runTest("py out simple", lambda: runPy("out", "test/simple.bin"))
         runTest("py in simple", lambda: runPy("in", "test/simple.bin"))
         runTest("py out complex", lambda: runPy("out_complex", "test/complex.bin"))
+        runTest(
+            "py out complex reuse",
+            lambda: runPy("out_complex_reuse", "test/complex.bin"),
+        )
+        runTest(
+            "py out complex splice",
+            lambda: runPy("out_complex_splice", "test/complex.bin"),
+        )
+        runTest(
+            "py out complex compact",
+            lambda: runPy("out_complex_compact", "test/complex.bin"),
+        )
+        runTest(
+            "py out complex file",
+            lambda: runPy("out_complex_file", "test/complex.bin"),
+        )
+        runTest(
+            "py message file",
+            lambda: runPy("message_file", "test/complex.bin"),
+        )
+        runTest("py aio", lambda: runPy("aio", "test/complex.bin"))
+        runTest(
+            "py out complex from",
+            lambda: runPy("out_complex_from", "test/complex.bin"),
+        )
         runTest("py in complex", lambda: runPy("in_complex", "test/complex.bin"))
+        runTest("py copy complex", lambda: runPy("copy_complex", "test/complex.bin"))
+        runTest(
+            "py copy complex embed",
+            lambda: runPy("copy_complex_embed", "test/complex.bin"),
+        )
+        runTest(
+            "py encode complex", lambda: runPy("encode_complex", "test/complex.bin")
+        )
+        runTest(
+            "py in complex verify",
+            lambda: runPy("in_complex_verify", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex tolist",
+            lambda: runPy("in_complex_tolist", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex slice",
+            lambda: runPy("in_complex_slice", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex json",
+            lambda: runPy("in_complex_json", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex digest",
+            lambda: runPy("in_complex_digest", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex mmap",
+            lambda: runPy("in_complex_mmap", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex compressed",
+            lambda: runPy("in_complex_compressed", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex shared",
+            lambda: runPy("in_complex_shared", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex parallel",
+            lambda: runPy("in_complex_parallel", "test/complex.bin"),
+        )
+        runTest(
+            "py in complex numpy",
+            lambda: runPy("in_complex_numpy", "test/complex.bin"),
+        )
         runTest("py in complex3", lambda: runPy("in_complex3", "test/complex.bin"))
         runTest("py out complex2", lambda: runPy("out_complex2", "test/complex2.bin"))
         runTest("py in complex2", lambda: runPy("in_complex2", "test/complex2.bin"))
         runTest("py out inplace", lambda: runPy("out_inplace", "test/inplace.bin"))
+        runTest(
+            "py out inplace from",
+            lambda: runPy("out_inplace_from", "test/inplace.bin"),
+        )
         runTest("py in inplace", lambda: runPy("in_inplace", "test/inplace.bin"))
         runTest("py out extend1", lambda: runPy("out_extend1", "test/extend1.bin"))
         runTest("py in extend1", lambda: runPy("in_extend1", "test/extend1.bin"))
@@ -0,0 +1,625 @@
+"""
+Benchmark the python runtime and the generated python code
+
+Messages are generated from test/base.spr and test/complex2.spr at the given
+sizes, and the time used to write, read, copy, verify, convert to dict and
+digest them is measured for each kind of member. The results are printed as
+JSON, so that runs can be compared over time.
+
+Run with: python3 test bench [--sizes 1K,1M] [--kinds ...] [--output file]
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import platform
+import sys
+import time
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+import scalgoproto
+import base
+import complex2
+
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+class Kind(NamedTuple):
+    """A kind of member to benchmark.
+
+    build writes a message of n items and returns its root, and read visits
+    the n items of the root. When scaled is False the message has a fixed size,
+    and each benchmark is repeated until the given size has been processed"""
+
+    name: str
+    root_in: type[scalgoproto.TableIn]
+    root_out: type[scalgoproto.TableOut]
+    item_size: int
+    scaled: bool
+    build: Callable[[scalgoproto.Writer, int], scalgoproto.TableOut]
+    read: Callable[[Any, int], None]
+
+
+def build_basic(w: scalgoproto.Writer, n: int) -> base.SimpleOut:
+    s = w.construct_table(base.SimpleOut)
+    s.e = base.MyEnum.c
+    s.s = base.FullStruct(
+        base.MyEnum.d,
+        base.MyStruct(42, 27.0, True),
+        False,
+        8,
+        9,
+        10,
+        11,
+        -8,
+        -9,
+        -10,
+        -11,
+        27.0,
+        22.0,
+    )
+    s.b = True
+    s.u8 = 242
+    s.u16 = 4024
+    s.u32 = 124474
+    s.u64 = 5465778
+    s.i8 = -40
+    s.i16 = 4025
+    s.i32 = 124475
+    s.i64 = 5465779
+    s.f = 2.0
+    s.d = 3.0
+    return s
+
+
+def read_basic(s: base.SimpleIn, n: int) -> None:
+    s.e, s.s, s.b, s.u8, s.u16, s.u32, s.u64
+    s.i8, s.i16, s.i32, s.i64, s.f, s.d
+
+
+def build_optional(w: scalgoproto.Writer, n: int) -> base.SimpleOut:
+    s = w.construct_table(base.SimpleOut)
+    s.os = base.MyStruct(43, 28.0, False)
+    s.ob = False
+    s.ou8 = 252
+    s.ou16 = 4034
+    s.ou32 = 124464
+    s.ou64 = 5465768
+    s.oi8 = -60
+    s.oi16 = 4055
+    s.oi32 = 124465
+    s.oi64 = 5465729
+    s.of = 5.0
+    s.od = 6.4
+    return s
+
+
+def read_optional(s: base.SimpleIn, n: int) -> None:
+    s.os, s.ob, s.ou8, s.ou16, s.ou32, s.ou64
+    s.oi8, s.oi16, s.oi32, s.oi64, s.of, s.od
+    s.ns, s.nb, s.nu8, s.nu16, s.nu32, s.nu64
+    s.ni8, s.ni16, s.ni32, s.ni64, s.nf, s.nd
+
+
+def build_union(w: scalgoproto.Writer, n: int) -> complex2.Complex2Out:
+    m = w.construct_table(base.MemberOut)
+    m.id = 42
+    enum_list = w.construct_enum_list(base.NamedUnionEnumList, 2)
+    enum_list[0] = base.NamedUnionEnumList.x
+    enum_list[1] = base.NamedUnionEnumList.z
+    r = w.construct_table(complex2.Complex2Out)
+    r.add_hat().id = 43
+    r.u1.member = m
+    r.u2.text = "text"
+    r.u3.my_bytes = b"bytes"
+    r.u4.enum_list = enum_list
+    return r
+
+
+def read_union(r: complex2.Complex2In, n: int) -> None:
+    r.u1.member.id, r.u2.text, r.u3.my_bytes, r.u4.enum_list[1], r.hat.id
+
+
+def build_text(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    s.text = "x" * n
+    return s
+
+
+def read_text(s: base.ComplexIn, n: int) -> None:
+    s.text
+
+
+def build_bytes(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    s.my_bytes = b"x" * n
+    return s
+
+
+def read_bytes(s: base.ComplexIn, n: int) -> None:
+    s.my_bytes
+
+
+def build_int_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_int_list(n)
+    for i in range(n):
+        lst[i] = i
+    return s
+
+
+def read_int_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.int_list:
+        pass
+
+
+def build_f32_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_f32list(n)
+    for i in range(n):
+        lst[i] = i * 0.5
+    return s
+
+
+def read_f32_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.f32list:
+        pass
+
+
+def build_f64_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_f64list(n)
+    for i in range(n):
+        lst[i] = i * 0.5
+    return s
+
+
+def read_f64_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.f64list:
+        pass
+
+
+def build_u8_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_u8list(n)
+    for i in range(n):
+        lst[i] = i & 0xFF
+    return s
+
+
+def read_u8_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.u8list:
+        pass
+
+
+def build_bool_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_blist(n)
+    for i in range(0, n, 3):
+        lst[i] = True
+    return s
+
+
+def read_bool_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.blist:
+        pass
+
+
+def build_enum_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_enum_list(n)
+    for i in range(n):
+        lst[i] = base.MyEnum(i & 3)
+    return s
+
+
+def read_enum_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.enum_list:
+        pass
+
+
+def build_struct_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_struct_list(n)
+    for i in range(n):
+        lst[i] = base.MyStruct(i, 1.5, True)
+    return s
+
+
+def read_struct_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.struct_list:
+        pass
+
+
+def build_text_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_text_list(n)
+    for i in range(n):
+        lst[i] = "item"
+    return s
+
+
+def read_text_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.text_list:
+        pass
+
+
+def build_bytes_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_bytes_list(n)
+    for i in range(n):
+        lst[i] = b"item"
+    return s
+
+
+def read_bytes_list(s: base.ComplexIn, n: int) -> None:
+    for _ in s.bytes_list:
+        pass
+
+
+def build_table_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_member_list(n)
+    for i in range(n):
+        lst.add(i).id = i & 0x7FFF
+    return s
+
+
+def read_table_list(s: base.ComplexIn, n: int) -> None:
+    for m in s.member_list:
+        m.id
+
+
+def build_direct_table_list(w: scalgoproto.Writer, n: int) -> base.ComplexOut:
+    s = w.construct_table(base.ComplexOut)
+    lst = s.add_direct_member_list(n)
+    for i in range(n):
+        lst[i].id = i & 0x7FFF
+    return s
+
+
+def read_direct_table_list(s: base.ComplexIn, n: int) -> None:
+    for m in s.direct_member_list:
+        m.id
+
+
+def build_union_list(w: scalgoproto.Writer, n: int) -> complex2.Complex2Out:
+    m = w.construct_table(base.MemberOut)
+    m.id = 42
+    r = w.construct_table(complex2.Complex2Out)
+    lst = r.add_l2(n)
+    for i in range(n):
+        if i & 1:
+            lst[i].member = m
+        else:
+            lst[i].text = "item"
+    return r
+
+
+def read_union_list(r: complex2.Complex2In, n: int) -> None:
+    for u in r.l2:
+        if u.is_member:
+            u.member.id
+        else:
+            u.text
+
+
+def build_inplace(w: scalgoproto.Writer, n: int) -> base.InplaceRootOut:
+    inplace_list = w.construct_table(base.InplaceListOut)
+    lst = inplace_list.add_l(n)
+    for i in range(n):
+        lst[i] = i
+    root = w.construct_table(base.InplaceRootOut)
+    root.l = inplace_list
+    return root
+
+
+def read_inplace(r: base.InplaceRootIn, n: int) -> None:
+    for _ in r.l.l:
+        pass
+
+
+KINDS = [
+    Kind("basic", base.SimpleIn, base.SimpleOut, 0, False, build_basic, read_basic),
+    Kind(
+        "optional",
+        base.SimpleIn,
+        base.SimpleOut,
+        0,
+        False,
+        build_optional,
+        read_optional,
+    ),
+    Kind(
+        "union",
+        complex2.Complex2In,
+        complex2.Complex2Out,
+        0,
+        False,
+        build_union,
+        read_union,
+    ),
+    Kind("text", base.ComplexIn, base.ComplexOut, 1, True, build_text, read_text),
+    Kind("bytes", base.ComplexIn, base.ComplexOut, 1, True, build_bytes, read_bytes),
+    Kind(
+        "int_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        4,
+        True,
+        build_int_list,
+        read_int_list,
+    ),
+    Kind(
+        "f32_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        4,
+        True,
+        build_f32_list,
+        read_f32_list,
+    ),
+    Kind(
+        "f64_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        8,
+        True,
+        build_f64_list,
+        read_f64_list,
+    ),
+    Kind(
+        "u8_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        1,
+        True,
+        build_u8_list,
+        read_u8_list,
+    ),
+    Kind(
+        "bool_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        1,
+        True,
+        build_bool_list,
+        read_bool_list,
+    ),
+    Kind(
+        "enum_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        1,
+        True,
+        build_enum_list,
+        read_enum_list,
+    ),
+    Kind(
+        "struct_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        9,
+        True,
+        build_struct_list,
+        read_struct_list,
+    ),
+    Kind(
+        "text_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        21,
+        True,
+        build_text_list,
+        read_text_list,
+    ),
+    Kind(
+        "bytes_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        20,
+        True,
+        build_bytes_list,
+        read_bytes_list,
+    ),
+    Kind(
+        "table_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        18,
+        True,
+        build_table_list,
+        read_table_list,
+    ),
+    Kind(
+        "direct_table_list",
+        base.ComplexIn,
+        base.ComplexOut,
+        2,
+        True,
+        build_direct_table_list,
+        read_direct_table_list,
+    ),
+    Kind(
+        "union_list",
+        complex2.Complex2In,
+        complex2.Complex2Out,
+        15,
+        True,
+        build_union_list,
+        read_union_list,
+    ),
+    Kind(
+        "inplace",
+        base.InplaceRootIn,
+        base.InplaceRootOut,
+        4,
+        True,
+        build_inplace,
+        read_inplace,
+    ),
+]
+
+BENCHMARKS = [
+    "write",
+    "read",
+    "copy",
+    "verify",
+    "to_dict",
+    "from_dict",
+    "digest",
+    "fast_digest",
+]
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().upper().removesuffix("B")
+    unit = s[-1:] if s[-1:] in UNITS else ""
+    return int(s[: len(s) - len(unit)]) * UNITS[unit]
+
+
+def best_time(func: Callable[[], None], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_kind(kind: Kind, size: int, benchmarks: list[str], repeat: int) -> list:
+    n = max(1, size // kind.item_size) if kind.scaled else 1
+    w = scalgoproto.Writer()
+    data = w.finalize(kind.build(w, n))
+    # Messages of a fixed size are processed this many times
+    times = 1 if kind.scaled else max(1, size // len(data))
+
+    def write() -> None:
+        for _ in range(times):
+            w = scalgoproto.Writer()
+            w.finalize(kind.build(w, n))
+
+    def read() -> None:
+        for _ in range(times):
+            kind.read(scalgoproto.Reader(data).root(kind.root_in), n)
+
+    def copy() -> None:
+        root = scalgoproto.Reader(data).root(kind.root_in)
+        for _ in range(times):
+            w = scalgoproto.Writer()
+            w.finalize(w.copy(kind.root_out, root))
+
+    def verify() -> None:
+        for _ in range(times):
+            scalgoproto.Reader(data).verify(kind.root_in)
+
+    def to_dict() -> None:
+        root = scalgoproto.Reader(data).root(kind.root_in)
+        for _ in range(times):
+            root._to_dict()
+
+    def from_dict() -> None:
+        d = scalgoproto.Reader(data).root(kind.root_in)._to_dict()
+        for _ in range(times):
+            scalgoproto.Writer().encode(kind.root_out, d)
+
+    def digest() -> None:
+        root = scalgoproto.Reader(data).root(kind.root_in)
+        for _ in range(times):
+            scalgoproto.digest(hashlib.sha256(), root)
+
+    def fast_digest() -> None:
+        root = scalgoproto.Reader(data).root(kind.root_in)
+        for _ in range(times):
+            scalgoproto.fast_digest(hashlib.sha256(), root)
+
+    funcs = {
+        "write": write,
+        "read": read,
+        "copy": copy,
+        "verify": verify,
+        "to_dict": to_dict,
+        "from_dict": from_dict,
+        "digest": digest,
+        "fast_digest": fast_digest,
+    }
+    results = []
+    for b in benchmarks:
+        print("%s %s %d" % (b, kind.name, size), file=sys.stderr)
+        seconds = best_time(funcs[b], repeat)
+        results.append(
+            {
+                "benchmark": b,
+                "kind": kind.name,
+                "size": size,
+                "message_bytes": len(data),
+                "items": n * times,
+                "seconds": seconds,
+                "bytes_per_second": len(data) * times / seconds if seconds else None,
+                "items_per_second": n * times / seconds if seconds else None,
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        default="1K,1M",
+        help="comma separated message sizes, like 1K,1M,1G (default %(default)s)",
+    )
+    parser.add_argument(
+        "--kinds",
+        default=",".join(k.name for k in KINDS),
+        help="comma separated kinds of members to benchmark (default all)",
+    )
+    parser.add_argument(
+        "--benchmarks",
+        default=",".join(BENCHMARKS),
+        help="comma separated benchmarks to run (default %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="report the best of this many runs (default %(default)s)",
+    )
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    kinds = {k.name: k for k in KINDS}
+    benchmarks = args.benchmarks.split(",")
+    for b in benchmarks:
+        if b not in BENCHMARKS:
+            parser.error("unknown benchmark %s" % b)
+    for k in args.kinds.split(","):
+        if k not in kinds:
+            parser.error("unknown kind %s" % k)
+
+    results = []
+    for size in map(parse_size, args.sizes.split(",")):
+        for k in args.kinds.split(","):
+            results.extend(bench_kind(kinds[k], size, benchmarks, args.repeat))
+
+    out = {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(out, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(out, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,20 @@
+import asyncio
+import base64
+import concurrent.futures
+import gc
+import hashlib
+import io
+import json
+import mmap
+import operator
+import os
+import pickle
 import sys
+import tempfile
 
 import scalgoproto
+import scalgoproto.aio
+import scalgoproto.parallel
 import base
 import complex2
 
@@ -413,9 +427,7 @@ def test_in_default(path: str) -> bool:
     return True
 
 
-def test_out_complex(path: str) -> bool:
-    w = scalgoproto.Writer()
-
+def out_complex(w: scalgoproto.Writer) -> base.ComplexOut:
     m = w.construct_table(base.MemberOut)
     m.id = 42
 
@@ -459,6 +471,310 @@ def test_out_complex(path: str) -> bool:
     l10[2] = True
     l10[8] = True
 
+    s = w.construct_table(base.ComplexOut)
+    s.member = m
+    s.text = t
+    s.my_bytes = b
+    s.int_list = int_list
+    s.struct_list = l3
+    s.enum_list = l2
+    s.text_list = l4
+    s.bytes_list = l5
+    s.member_list = l6
+    s.direct_member_list = l6a
+    s.f32list = l7
+    s.f64list = l8
+    s.u8list = l9
+    s.blist = l10
+    return s
+
+
+def test_out_complex(path: str) -> bool:
+    w = scalgoproto.Writer()
+    data = w.finalize(out_complex(w))
+    return validate_out(data, path)
+
+
+def test_out_complex_reuse(path: str) -> bool:
+    w = scalgoproto.Writer(initial_capacity=16, growth_factor=1.5)
+    for _ in range(2):
+        data = w.finalize(out_complex(w), copy=False)
+        if require(isinstance(data, memoryview), True):
+            return False
+        if not validate_out(data, path):
+            return False
+        data.release()
+        w.reset()
+    return True
+
+
+def test_out_complex_splice(path: str) -> bool:
+    part = scalgoproto.Writer()
+    part.finalize(out_complex(part))
+    member = scalgoproto.Writer()
+    m = member.construct_table(base.MemberOut)
+    m.id = 7
+    member_data = member.finalize(m)
+    w = scalgoproto.Writer()
+    w.construct_text("moved")
+    c1 = w.splice(base.ComplexOut, part)
+    c2 = w.splice(base.ComplexOut, read_in(path))
+    c2.nmember = w.splice(base.MemberOut, member_data)
+    data = w.finalize(c2)
+    r = scalgoproto.Reader(data)
+    r.verify(base.ComplexIn)
+    d = r.root(base.ComplexIn)._to_dict()
+    if require(d.pop("nmember"), {"id": 7}):
+        return False
+    exp = scalgoproto.Reader(read_in(path)).root(base.ComplexIn)._to_dict()
+    exp.pop("nmember", None)
+    if require(d, exp):
+        return False
+    if not test_complex_part(base.ComplexIn(r, c1._offset, len(c1._DEFAULT))):
+        return False
+    # Offsets in members of a newer schema can not be moved
+    try:
+        w.splice(
+            base.Gen1Out, read_in(os.path.join(os.path.dirname(path), "extend2.bin"))
+        )
+        print("Expected splice to fail for a newer schema", file=sys.stderr)
+        return False
+    except Exception:
+        pass
+    # The magics of the root and of the objects below it must match the schema
+    bad = bytearray(read_in(path))
+    member = scalgoproto.Reader(bad).root(base.ComplexIn).member
+    bad[member._offset - 10 : member._offset - 6] = bytes(4)
+    for t, data in ((base.SimpleOut, read_in(path)), (base.ComplexOut, bad)):
+        try:
+            w.splice(t, data)
+            print("Expected splice to fail for a wrong magic", file=sys.stderr)
+            return False
+        except Exception as e:
+            if require(str(e).startswith("Expected magic"), True):
+                return False
+    return True
+
+
+def test_out_complex_compact(path: str) -> bool:
+    w = scalgoproto.Writer()
+    w.construct_text("dead")
+    w.construct_int32_list(4)
+    root = out_complex(w)
+    w.construct_text("unused")
+    data = w.finalize(root)
+    compacted = scalgoproto.compact(scalgoproto.Reader(data), base.ComplexIn)
+    if not validate_out(compacted, path):
+        return False
+    data = w.finalize(root, compact=True)
+    if require(w.reclaimed, 15 + 26 + 17):
+        return False
+    return validate_out(data, path)
+
+
+def test_out_complex_file(path: str) -> bool:
+    with tempfile.TemporaryDirectory() as d:
+        out = os.path.join(d, "complex.bin")
+        backing = scalgoproto.FileWriterBacking(out)
+        w = scalgoproto.Writer(backing=backing)
+        for _ in range(2):
+            data = w.finalize(out_complex(w), copy=False)
+            if not validate_out(data, path):
+                return False
+            data.release()
+            if not validate_out(read_in(out), path):
+                return False
+            w.reset()
+        backing.close()
+        # Writing on after finalizing grows the truncated file again
+        backing = scalgoproto.FileWriterBacking(out)
+        w = scalgoproto.Writer(initial_capacity=100000, backing=backing)
+        w.finalize(out_complex(w))
+        m = w.construct_table(base.MemberOut)
+        m.id = 12
+        data = w.finalize(m)
+        if require(read_in(out), data):
+            return False
+        if require(scalgoproto.Reader(data).root(base.MemberIn).id, 12):
+            return False
+        backing.close()
+    return True
+
+
+def test_message_file(path: str) -> bool:
+    data = read_in(path)
+    with tempfile.TemporaryDirectory() as d:
+        out = os.path.join(d, "messages.bin")
+        with scalgoproto.MessageFileWriter(out) as w:
+            for _ in range(3):
+                w.write(data)
+        with scalgoproto.MessageFileWriter(out, append=True) as w:
+            if require(w.write(data), 3):
+                return False
+        with scalgoproto.MessageFileReader(out) as r:
+            if require(len(r), 4):
+                return False
+            for m in r:
+                if require(bytes(m._data), data):
+                    return False
+            del m
+        # Without the index and with the last frame cut short, the remaining
+        # messages are recovered by scanning
+        size = os.path.getsize(out)
+        with open(out, "r+b") as f:
+            f.truncate(size - 4 * 8 - 20 - 1)
+        with scalgoproto.MessageFileReader(out) as r:
+            if require(len(r), 3):
+                return False
+            if not test_complex_part(r[2].root(base.ComplexIn)):
+                return False
+    return True
+
+
+def test_aio(path: str) -> bool:
+    exp = read_in(path)
+    received: list[bytes] = []
+
+    async def serve(stream: scalgoproto.aio.MessageStream) -> None:
+        while (r := await scalgoproto.aio.read_message(stream)) is not None:
+            received.append(bytes(r._data))
+        stream.close()
+
+    async def run() -> None:
+        server = await scalgoproto.aio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        stream = await scalgoproto.aio.open_connection("127.0.0.1", port)
+        w = scalgoproto.Writer()
+        for _ in range(100):
+            await scalgoproto.aio.write_message(stream, w, out_complex(w))
+            w.reset()
+        # Larger than the receive buffer
+        big = w.construct_table(base.ComplexOut)
+        big.int_list_from(range(100000))
+        await scalgoproto.aio.write_message(stream, w, big)
+        stream.close()
+        while len(received) < 101:
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(run(), 30))
+    if require(received[:100], [exp] * 100):
+        return False
+    big = scalgoproto.Reader(received[100]).root(base.ComplexIn)
+    if require(big.int_list.tolist(), list(range(100000))):
+        return False
+
+    # Buffers are not reused while zero_copy values read from them are alive
+    views: list[memoryview] = []
+
+    async def serve_views(stream: scalgoproto.aio.MessageStream) -> None:
+        while (r := await scalgoproto.aio.read_message(stream)) is not None:
+            views.append(r.root(base.ComplexIn).my_bytes)
+            del r
+            gc.collect()
+        stream.close()
+
+    async def run_views() -> None:
+        server = await scalgoproto.aio.start_server(
+            serve_views, "127.0.0.1", 0, zero_copy=True
+        )
+        port = server.sockets[0].getsockname()[1]
+        stream = await scalgoproto.aio.open_connection("127.0.0.1", port)
+        w = scalgoproto.Writer()
+        for i, b in enumerate((b"AAAA", b"BBBB")):
+            root = w.construct_table(base.ComplexOut)
+            root.my_bytes = b
+            await scalgoproto.aio.write_message(stream, w, root)
+            w.reset()
+            while len(views) <= i:
+                await asyncio.sleep(0.01)
+        stream.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(run_views(), 30))
+    if require([bytes(v) for v in views], [b"AAAA", b"BBBB"]):
+        return False
+
+    # Frames larger than max_message_size fail the stream, and only one task
+    # may wait for messages on a stream
+    errors: list[str] = []
+
+    async def serve_limited(stream: scalgoproto.aio.MessageStream) -> None:
+        try:
+            await scalgoproto.aio.read_message(stream)
+        except Exception as e:
+            errors.append(str(e))
+
+    async def run_limited() -> None:
+        server = await scalgoproto.aio.start_server(
+            serve_limited, "127.0.0.1", 0, max_message_size=1000
+        )
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(scalgoproto._UINT64.pack(1 << 60))
+        # The server closes the connection
+        await reader.read()
+        writer.close()
+        stream = await scalgoproto.aio.open_connection("127.0.0.1", port)
+        task = asyncio.ensure_future(scalgoproto.aio.read_message(stream))
+        await asyncio.sleep(0)
+        try:
+            await scalgoproto.aio.read_message(stream)
+        except RuntimeError:
+            errors.append("busy")
+        task.cancel()
+        stream.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(run_limited(), 30))
+    if require(
+        sorted(errors),
+        ["Message of %d bytes exceeds max_message_size 1000" % (1 << 60), "busy"],
+    ):
+        return False
+    return True
+
+
+def out_complex_from(path: str, lists: dict) -> bool:
+    w = scalgoproto.Writer()
+
+    m = w.construct_table(base.MemberOut)
+    m.id = 42
+
+    int_list = w.construct_int32_list_from(lists["int_list"])
+    l2 = w.construct_enum_list_from(base.MyEnum, lists["enum_list"])
+    l3 = w.construct_struct_list_from(base.MyStruct, lists["struct_list"])
+
+    b = w.construct_bytes(b"bytes")
+    t = w.construct_text("text")
+
+    l4 = w.construct_text_list(200)
+    for i in range(1, len(l4), 2):
+        l4[i] = "HI THERE"
+    l5 = w.construct_bytes_list(1)
+    l5[0] = b
+
+    l6 = w.construct_table_list(base.MemberOut, 3)
+    l6[0] = m
+    l6[2] = m
+
+    if "direct_member_list" in lists:
+        l6a = w.construct_direct_table_list_from(
+            base.MemberOut, lists["direct_member_list"]
+        )
+    else:
+        l6a = w.construct_direct_table_list(base.MemberOut, 3)
+        l6a[0].id = 43
+        l6a[2].id = 43
+
+    l7 = w.construct_float32_list_from(lists["f32list"])
+    l8 = w.construct_float64_list_from(lists["f64list"])
+    l9 = w.construct_uint8_list_from(lists["u8list"])
+    l10 = w.construct_bool_list_from(lists["blist"])
+
     s = w.construct_table(base.ComplexOut)
     s.member = m
     s.text = t
@@ -479,10 +795,92 @@ def test_out_complex(path: str) -> bool:
     return validate_out(data, path)
 
 
-def test_in_complex(path: str) -> bool:
-    r = scalgoproto.Reader(read_in(path))
+def test_out_complex_from(path: str) -> bool:
+    lists = {
+        "int_list": range(100, 38, -2),
+        "enum_list": [base.MyEnum.a, None],
+        "struct_list": [base.MyStruct()],
+        "f32list": [0.0, 98.0],
+        "f64list": (0.0, 0.0, 78.0),
+        "u8list": [4, 0],
+        "blist": (i in (0, 2, 8) for i in range(10)),
+    }
+    if not out_complex_from(path, lists):
+        return False
 
-    s = r.root(base.ComplexIn)
+    w = scalgoproto.Writer()
+    o = w.construct_table(base.ComplexOut)
+    o.int_list_from(range(5))
+    o.enum_list_from([base.MyEnum.c, None])
+    o.struct_list_from(base.MyStruct(i, 0.5, True) for i in range(3))
+    o.blist_from([True, False, True] * 7)
+    r = scalgoproto.Reader(w.finalize(o)).root(base.ComplexIn)
+    if require(list(r.int_list), [0, 1, 2, 3, 4]):
+        return False
+    if require(len(r.enum_list), 2) or require(r.enum_list[0], base.MyEnum.c):
+        return False
+    if require(r.enum_list.has(1), False):
+        return False
+    if require([(v.x, v.z) for v in r.struct_list], [(0, True), (1, True), (2, True)]):
+        return False
+    if require(list(r.blist), [True, False, True] * 7):
+        return False
+
+    try:
+        import numpy
+    except ImportError:
+        print("numpy is not installed, skipping numpy input")
+        return True
+    lists = {
+        "int_list": numpy.arange(100, 38, -2),
+        "enum_list": numpy.array([int(base.MyEnum.a), 255]),
+        "struct_list": numpy.zeros(1, scalgoproto.numpy_dtype(base.MyStruct)),
+        "f32list": numpy.array([0.0, 98.0]),
+        "f64list": numpy.array([0.0, 0.0, 78.0], numpy.float32),
+        "u8list": numpy.array([4, 0], numpy.int64),
+        "blist": numpy.isin(numpy.arange(10), (0, 2, 8)),
+        "direct_member_list": numpy.array(
+            [(43,), (0,), (43,)], scalgoproto.numpy_table_dtype(base.MemberOut)
+        ),
+    }
+    if not out_complex_from(path, lists):
+        return False
+
+    # Values that do not fit are rejected like for other iterables
+    o = scalgoproto.Writer().construct_table(base.ComplexOut)
+    for values in ([300], numpy.array([300]), numpy.array([-1]), numpy.array([0.5])):
+        try:
+            o.u8list_from(values)
+            print("Expected u8list_from(%r) to fail" % (values,))
+            return False
+        except (OverflowError, TypeError):
+            pass
+    for values in ([300], numpy.array([1, 300, -1])):
+        try:
+            o.enum_list_from(values)
+            print("Expected enum_list_from(%r) to fail" % (values,))
+            return False
+        except ValueError:
+            pass
+    o.enum_list_from(numpy.array([1, 255]))
+
+    w = scalgoproto.Writer()
+    o = w.construct_table(base.Gen3Out)
+    o.direct_member_list_from({"id": numpy.arange(3)})
+    r = scalgoproto.Reader(w.finalize(o)).root(base.Gen3In)
+    members = [(m.id, m.cookie) for m in r.direct_member_list]
+    if require(members, [(0, 37), (1, 37), (2, 37)]):
+        return False
+    try:
+        o.direct_member_list_from({"id": numpy.arange(3), "cookie": [1, 2]})
+        print("Expected columns of different lengths to fail", file=sys.stderr)
+        return False
+    except ValueError:
+        pass
+    return True
+
+
+def test_complex_part(s: base.ComplexIn) -> bool:
     if require_none(s.nmember):
         return False
     if require_none(s.ntext):
@@ -633,6 +1031,370 @@ def test_in_complex(path: str) -> bool:
     return True
 
 
+def test_in_complex(path: str) -> bool:
+    r = scalgoproto.Reader(read_in(path))
+    return test_complex_part(r.root(base.ComplexIn))
+
+
+def test_copy_complex(path: str) -> bool:
+    r = scalgoproto.Reader(read_in(path))
+    w = scalgoproto.Writer()
+    data = w.finalize(w.copy(base.ComplexOut, r.root(base.ComplexIn)))
+    return test_complex_part(scalgoproto.Reader(data).root(base.ComplexIn))
+
+
+def test_copy_complex_embed(path: str) -> bool:
+    data = read_in(path)
+    r = scalgoproto.Reader(data)
+    w = scalgoproto.Writer()
+    w.construct_text("moved")
+    root = w.embed(base.ComplexOut, r.root(base.ComplexIn))
+    # The whole message is copied at once, and the members are not rewritten
+    out = w.finalize(root)
+    if require(len(out), len(data) + 16):
+        return False
+    r2 = scalgoproto.Reader(out)
+    r2.verify(base.ComplexIn)
+    if not test_complex_part(r2.root(base.ComplexIn)):
+        return False
+    # Tables in direct lists and tables with dead objects between their
+    # members are copied member by member instead
+    w = scalgoproto.Writer()
+    c = w.construct_table(base.ComplexOut)
+    c.text = "dead"
+    c.text = "alive"
+    c.member = w.embed(base.MemberOut, r.root(base.ComplexIn).direct_member_list[0])
+    c2 = scalgoproto.Reader(w.finalize(c)).root(base.ComplexIn)
+    w = scalgoproto.Writer()
+    c3 = scalgoproto.Reader(w.finalize(w.embed(base.ComplexOut, c2)))
+    c3 = c3.root(base.ComplexIn)
+    if require((c3.text, c3.member.id), ("alive", 43)):
+        return False
+    # Only the blocks of the embedded table are decompressed
+    w = scalgoproto.Writer()
+    c = w.construct_table(base.ComplexOut)
+    c.int_list_from(range(50000))
+    m = w.construct_table(base.MemberOut)
+    m.id = 44
+    c.member = m
+    c = scalgoproto.compress_message(w.finalize(c), block_size=mmap.PAGESIZE)
+    r = scalgoproto.CompressedReader(c)
+    w = scalgoproto.Writer()
+    m = scalgoproto.Reader(
+        w.finalize(w.embed(base.MemberOut, r.root(base.ComplexIn).member))
+    )
+    if require((m.root(base.MemberIn).id, sum(r._loaded) < 5), (44, True)):
+        return False
+    return True
+
+
+def test_encode_complex(path: str) -> bool:
+    d = scalgoproto.Reader(read_in(path)).root(base.ComplexIn)._to_dict()
+    data = scalgoproto.Writer().encode(base.ComplexOut, d)
+    s = scalgoproto.Reader(data).root(base.ComplexIn)
+    if require(s._to_dict(), d):
+        return False
+    if require(s.text_list[1], "HI THERE"):
+        return False
+    # None means the member has no value, also for numbers and enums
+    empty = scalgoproto.Writer().encode(base.SimpleOut, {})
+    d = dict.fromkeys(base.SimpleIn._MEMBERS)
+    data = scalgoproto.Writer().encode(base.SimpleOut, d)
+    if require(bytes(data), bytes(empty)):
+        return False
+    return True
+
+
+def test_in_complex_verify(path: str) -> bool:
+    data = read_in(path)
+    r = scalgoproto.Reader(data)
+    r.verify(base.ComplexIn)
+    if not test_complex_part(r.root(base.ComplexIn)):
+        return False
+
+    text = data.index(scalgoproto.TEXT_MAGIC.to_bytes(4, "little"))
+    bad = [
+        ("truncated", data[: len(data) - 1], {}),
+        ("bad magic", data[:text] + b"\0" + data[text + 1 :], {}),
+        ("too deep", data, {"max_depth": 0}),
+        ("too many", data, {"max_objects": 10}),
+    ]
+    for name, d, args in bad:
+        try:
+            scalgoproto.Reader(d).verify(base.ComplexIn, **args)
+            print("Expected verify to fail for %s" % name, file=sys.stderr)
+            return False
+        except Exception:
+            pass
+
+    # Verifying does not stop the root from being read with the wrong type
+    try:
+        r.root(base.MemberIn)
+        print("Expected root to fail for the wrong type", file=sys.stderr)
+        return False
+    except Exception:
+        pass
+    if not test_complex_part(r.root(base.ComplexIn)):
+        return False
+
+    # Unset elements of bytes lists are rejected after verify as well
+    w = scalgoproto.Writer()
+    root = w.construct_table(base.ComplexOut)
+    root.bytes_list = w.construct_bytes_list(1)
+    r = scalgoproto.Reader(w.finalize(root))
+    r.verify(base.ComplexIn)
+    try:
+        v = r.root(base.ComplexIn).bytes_list[0]
+        print("Expected unset bytes to fail but got %r" % v, file=sys.stderr)
+        return False
+    except Exception:
+        pass
+    return True
+
+
+def test_in_complex_tolist(path: str) -> bool:
+    s = scalgoproto.Reader(read_in(path)).root(base.ComplexIn)
+    for lst in (
+        s.int_list,
+        s.f32list,
+        s.f64list,
+        s.u8list,
+        s.blist,
+        s.struct_list,
+        s.bytes_list,
+        s.text_list,
+    ):
+        if require(
+            list(map(str, lst.tolist())), [str(lst[i]) for i in range(len(lst))]
+        ):
+            return False
+    if require(s.enum_list.tolist(), [base.MyEnum.a]):
+        return False
+    if require([m.id for m in s.member_list], [42, 0, 42]):
+        return False
+    if require([m.id for m in s.direct_member_list], [43, 0, 43]):
+        return False
+    # The generated _to_dict and __str__ must agree with the reflective ones
+    if require(s._to_dict(), scalgoproto.TableIn._to_dict(s)):
+        return False
+    if require(str(s), scalgoproto.TableIn.__str__(s)):
+        return False
+    return True
+
+
+def test_in_complex_json(path: str) -> bool:
+    s = scalgoproto.Reader(read_in(path)).root(base.ComplexIn)
+    exp = json.dumps(
+        s._to_dict(), default=lambda b: base64.b64encode(b).decode("ascii")
+    )
+    for chunk_size in (1, 3, 1 << 14):
+        f = io.StringIO()
+        scalgoproto.dump_json(s, f, chunk_size)
+        if require(f.getvalue(), exp):
+            return False
+    return True
+
+
+def test_in_complex_slice(path: str) -> bool:
+    s = scalgoproto.Reader(read_in(path)).root(base.ComplexIn)
+    ints = s.int_list.tolist()
+    for a, b, c in ((2, 20, None), (-5, None, None), (3, 30, 4), (None, None, -3)):
+        v = s.int_list[a:b:c]
+        if require(isinstance(v, scalgoproto.ListIn), True):
+            return False
+        if require(v.tolist(), ints[a:b:c]):
+            return False
+        if require(v[1:][::2].tolist(), ints[a:b:c][1:][::2]):
+            return False
+    bools = s.blist.tolist()
+    if require(s.blist[1:9].tolist(), bools[1:9]):
+        return False
+    if require(s.blist[2::3].tolist(), bools[2::3]):
+        return False
+    if require([m.id for m in s.member_list[2:]], [42]):
+        return False
+    if require(s.text_list[1:6:2].tolist(), ["HI THERE"] * 3):
+        return False
+    if require([len(c) for c in s.int_list.chunks(10)], [10, 10, 10, 1]):
+        return False
+    return not require(
+        [c.tolist() for c in s.int_list[4:8].chunks(3)], [ints[4:7], ints[7:8]]
+    )
+
+
+def test_in_complex_digest(path: str) -> bool:
+    data = read_in(path)
+    s = scalgoproto.Reader(data).root(base.ComplexIn)
+    h1, h2 = hashlib.sha256(), hashlib.sha256()
+    scalgoproto.digest(h1, s)
+    scalgoproto.fast_digest(h2, s, legacy=True)
+    if require(h2.hexdigest(), h1.hexdigest()):
+        return False
+
+    def canonical(d: scalgoproto.Buffer, t: type[scalgoproto.TableIn]) -> str:
+        h = hashlib.sha256()
+        scalgoproto.fast_digest(h, scalgoproto.Reader(d, zero_copy=True).root(t))
+        return h.hexdigest()
+
+    # The canonical format is fixed, see doc/digest.md
+    if require(
+        canonical(data, base.ComplexIn),
+        "22a29e9d11b5b1901f57da80a9f633c725b2bfba548348453ddd005da4dc3667",
+    ):
+        return False
+
+    # It does not depend on the layout of the message
+    inplace = read_in(path.replace("complex", "inplace"))
+    r = scalgoproto.Reader(inplace).root(base.InplaceRootIn)
+    w = scalgoproto.Writer()
+    copy = w.finalize(w.copy(base.InplaceRootOut, r))
+    if require(copy != inplace, True):
+        return False
+    if require(
+        canonical(copy, base.InplaceRootIn), canonical(inplace, base.InplaceRootIn)
+    ):
+        return False
+
+    # But it does depend on the content
+    changed = bytearray(data)
+    changed[s._get_uint48(36) + 10] ^= 1
+    return not require(
+        canonical(changed, base.ComplexIn) != canonical(data, base.ComplexIn), True
+    )
+
+
+def test_in_complex_mmap(path: str) -> bool:
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    r = scalgoproto.Reader(data, zero_copy=True)
+    s = r.root(base.ComplexIn)
+    if require(isinstance(s.my_bytes, memoryview), True):
+        return False
+    return test_complex_part(s)
+
+
+def test_in_complex_compressed(path: str) -> bool:
+    data = read_in(path)
+    for codec in ("zlib", "lzma", "bz2"):
+        c = scalgoproto.compress_message(data, codec, block_size=64)
+        r = scalgoproto.CompressedReader(c)
+        if not test_complex_part(r.root(base.ComplexIn)):
+            return False
+        r = scalgoproto.CompressedReader(c)
+        r.verify(base.ComplexIn)
+        if require(bytes(r._data), data):
+            return False
+
+    # Only max_blocks blocks are kept besides those of live tables and views
+    w = scalgoproto.Writer()
+    root = w.construct_table(base.ComplexOut)
+    m = w.construct_table(base.MemberOut)
+    m.id = 7
+    root.member = m
+    root.my_bytes = b"x" * 20000
+    root.int_list_from(range(50000))
+    c = scalgoproto.compress_message(w.finalize(root), block_size=mmap.PAGESIZE)
+    r = scalgoproto.CompressedReader(c, zero_copy=True, max_blocks=2)
+    s = r.root(base.ComplexIn)
+    member = s.member
+    b = s.my_bytes
+    ints = s.int_list
+    if require(sum(ints), sum(range(50000))):
+        return False
+    if require(sum(r._loaded) < 20, True):
+        return False
+    if require((member.id, bytes(b)), (7, b"x" * 20000)):
+        return False
+    if require(
+        (ints[0], ints[-1], ints[::12345].tolist()),
+        (0, 49999, [0, 12345, 24690, 37035, 49380]),
+    ):
+        return False
+    return True
+
+
+def test_in_complex_shared(path: str) -> bool:
+    with scalgoproto.SharedReader(read_in(path)) as r:
+        s = r.root(base.ComplexIn)
+        data = pickle.dumps((s, s.int_list[1:], s.direct_member_list))
+        if require(len(data) < 1000, True):
+            return False
+        t, ints, members = pickle.loads(data)
+        if not test_complex_part(t):
+            return False
+        if require(ints.tolist(), s.int_list.tolist()[1:]):
+            return False
+        if require([m.id for m in members], [43, 0, 43]):
+            return False
+        with concurrent.futures.ProcessPoolExecutor(2) as pool:
+            sums = list(pool.map(sum, s.int_list.chunks(7)))
+            if require(sums, [sum(c) for c in s.int_list.chunks(7)]):
+                return False
+            if require(list(pool.map(str, [s])), [str(s)]):
+                return False
+        del s, t, ints, members
+    return True
+
+
+def test_in_complex_parallel(path: str) -> bool:
+    map_list = scalgoproto.parallel.map_list
+    with scalgoproto.MappedReader(path) as r:
+        s = r.root(base.ComplexIn)
+        ints = list(map_list(operator.neg, s.int_list, workers=2, chunk=4))
+        if require(ints, [-v for v in s.int_list]):
+            return False
+        sums = list(map_list(sum, s.int_list[::-1], 2, 5, ranges=True))
+        if require(sums, [sum(c) for c in s.int_list[::-1].chunks(5)]):
+            return False
+        structs = list(map_list(str, s.struct_list, 2))
+        if require(structs, list(map(str, s.struct_list))):
+            return False
+        del s
+    # Lists of other readers are copied into shared memory
+    s = scalgoproto.Reader(read_in(path)).root(base.ComplexIn)
+    ids = list(map_list(operator.attrgetter("id"), s.direct_member_list, 2))
+    if require(ids, [43, 0, 43]):
+        return False
+    return True
+
+
+def test_in_complex_numpy(path: str) -> bool:
+    try:
+        import numpy
+    except ImportError:
+        print("numpy is not installed, skipping")
+        return True
+    r = scalgoproto.Reader(read_in(path))
+    s = r.root(base.ComplexIn)
+    if require(s.int_list_array.tolist(), [100 - 2 * i for i in range(31)]):
+        return False
+    if require(s.int_list_array.dtype, numpy.dtype("<i4")):
+        return False
+    if require(s.nint_list_array, None):
+        return False
+    if require(s.enum_list_array.tolist(), [int(base.MyEnum.a), 255]):
+        return False
+    if require(s.struct_list_array["x"].tolist(), [0]):
+        return False
+    if require(s.struct_list_array.dtype.itemsize, base.MyStruct._WIDTH):
+        return False
+    if require(s.f32list_array.tolist(), [0.0, 98.0]):
+        return False
+    if require(s.f64list_array.tolist(), [0.0, 0.0, 78.0]):
+        return False
+    if require(s.u8list_array.tolist(), [4, 0]):
+        return False
+    if require(s.blist_array.tolist(), [i in (0, 2, 8) for i in range(10)]):
+        return False
+    try:
+        s.text_list.as_numpy()
+        print("Expected text list as_numpy to fail", file=sys.stderr)
+        return False
+    except TypeError:
+        pass
+    return True
+
+
 def test_in_complex3(path: str) -> bool:
     r = scalgoproto.Reader(read_in(path))
 
@@ -894,6 +1656,38 @@ def test_out_inplace(path: str) -> bool:
     return validate_out(data, path)
 
 
+def test_out_inplace_from(path: str) -> bool:
+    w = scalgoproto.Writer()
+    name = w.construct_text("nilson")
+    u = w.construct_table(base.InplaceUnionOut)
+    u.u.add_monkey().name = name
+
+    u2 = w.construct_table(base.InplaceUnionOut)
+    u2.u.add_empty()
+
+    t = w.construct_table(base.InplaceTextOut)
+    t.id = 45
+    t.t = "cake"
+
+    b = w.construct_table(base.InplaceBytesOut)
+    b.id = 46
+    b.b = b"hi"
+
+    inplace_list = w.construct_table(base.InplaceListOut)
+    inplace_list.id = 47
+    if require(len(inplace_list.l_from([24, 99])), 2):
+        return False
+
+    root = w.construct_table(base.InplaceRootOut)
+    root.u = u
+    root.u2 = u2
+    root.t = t
+    root.b = b
+    root.l = inplace_list
+    data = w.finalize(root)
+    return validate_out(data, path)
+
+
 def test_in_inplace(path: str) -> bool:
     o = read_in(path)
     r = scalgoproto.Reader(o)
@@ -1015,6 +1809,12 @@ def test_extend2_part(s: base.Gen3In) -> bool:
         return False
     if require(members[3].cookie, 37):
         return False
+    if require(list(members.column("id")), [100, 101, 102, 103]):
+        return False
+    if require(list(members.column("cookie")), [37] * 4):
+        return False
+    if require(list(members[1::2].column("id")), [101, 103]):
+        return False
     if require(s.e, base.MyEnum.c):
         return False
     if require(s.s.x, 0):
@@ -1125,8 +1925,48 @@ def main() -> None:
         ans = test_in_default(path)
     elif test == "out_complex":
         ans = test_out_complex(path)
+    elif test == "out_complex_reuse":
+        ans = test_out_complex_reuse(path)
+    elif test == "out_complex_splice":
+        ans = test_out_complex_splice(path)
+    elif test == "out_complex_compact":
+        ans = test_out_complex_compact(path)
+    elif test == "out_complex_file":
+        ans = test_out_complex_file(path)
+    elif test == "message_file":
+        ans = test_message_file(path)
+    elif test == "aio":
+        ans = test_aio(path)
+    elif test == "out_complex_from":
+        ans = test_out_complex_from(path)
     elif test == "in_complex":
         ans = test_in_complex(path)
+    elif test == "copy_complex":
+        ans = test_copy_complex(path)
+    elif test == "copy_complex_embed":
+        ans = test_copy_complex_embed(path)
+    elif test == "encode_complex":
+        ans = test_encode_complex(path)
+    elif test == "in_complex_verify":
+        ans = test_in_complex_verify(path)
+    elif test == "in_complex_tolist":
+        ans = test_in_complex_tolist(path)
+    elif test == "in_complex_slice":
+        ans = test_in_complex_slice(path)
+    elif test == "in_complex_json":
+        ans = test_in_complex_json(path)
+    elif test == "in_complex_digest":
+        ans = test_in_complex_digest(path)
+    elif test == "in_complex_mmap":
+        ans = test_in_complex_mmap(path)
+    elif test == "in_complex_compressed":
+        ans = test_in_complex_compressed(path)
+    elif test == "in_complex_shared":
+        ans = test_in_complex_shared(path)
+    elif test == "in_complex_parallel":
+        ans = test_in_complex_parallel(path)
+    elif test == "in_complex_numpy":
+        ans = test_in_complex_numpy(path)
     elif test == "in_complex3":
         ans = test_in_complex3(path)
     elif test == "out_complex2":
@@ -1135,6 +1975,8 @@ def main() -> None:
         ans = test_in_complex2(path)
     elif test == "out_inplace":
         ans = test_out_inplace(path)
+    elif test == "out_inplace_from":
+        ans = test_out_inplace_from(path)
     elif test == "in_inplace":
         ans = test_in_inplace(path)
     elif test == "out_extend1":